@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+Streaming pipeline logging a CSV export of any size with its PII fields
+redacted. Rows are read in chunks and redacted by column in a process
+pool; chunks are logged in file order and at most a few are in flight,
+so memory does not grow with the file.
+"""
+
+import csv
+import logging
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterator, List, Tuple
+
+from filtered_logger import PII_FIELDS, RedactingFormatter
+
+CHUNK_ROWS = int(os.getenv('USER_DATA_CHUNK_ROWS', '5000'))
+WORKERS = int(os.getenv('USER_DATA_WORKERS', str(os.cpu_count() or 1)))
+
+
+def read_chunks(path: str,
+                chunk_rows: int) -> Iterator[Tuple[List[str],
+                                                   List[List[str]]]]:
+    """
+    Yields (header, rows) chunks of at most chunk_rows rows.
+    """
+    with open(path, newline='') as csvfile:
+        reader = csv.reader(csvfile)
+        header = next(reader, None)
+        if header is None:
+            return
+        chunk = []
+        for row in reader:
+            chunk.append(row)
+            if len(chunk) == chunk_rows:
+                yield header, chunk
+                chunk = []
+        if chunk:
+            yield header, chunk
+
+
+def redact_chunk(header: List[str], rows: List[List[str]]) -> List[str]:
+    """
+    Returns the log message of each row, the PII columns replaced
+    before the message is built rather than searched in it.
+    """
+    redaction = RedactingFormatter.REDACTION
+    keys = [key + '=' for key in header]
+    pii = [key in PII_FIELDS for key in header]
+    return ['; '.join(key + (redaction if hidden else value)
+                      for key, hidden, value in zip(keys, pii, row))
+            for row in rows]
+
+
+def redacted_messages(path: str, chunk_rows: int = CHUNK_ROWS,
+                      workers: int = WORKERS) -> Iterator[str]:
+    """
+    Yields the redacted message of every row of path, in file order.
+    Reading pauses while 2 chunks per worker are being redacted.
+    """
+    with ProcessPoolExecutor(workers) as pool:
+        pending = deque()
+        for header, rows in read_chunks(path, chunk_rows):
+            pending.append(pool.submit(redact_chunk, header, rows))
+            if len(pending) >= 2 * workers:
+                yield from pending.popleft().result()
+        while pending:
+            yield from pending.popleft().result()
+
+
+def get_export_logger() -> logging.Logger:
+    """
+    Creates a logger for messages the pipeline already redacted,
+    formatted like user_data but without scanning them again.
+    """
+    logger = logging.getLogger('user_data.export')
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+    if not logger.handlers:
+        handler = logging.StreamHandler()
+        handler.setFormatter(logging.Formatter(RedactingFormatter.FORMAT))
+        logger.addHandler(handler)
+    return logger
+
+
+def main() -> None:
+    """
+    Logs the CSV file given on the command line (user_data.csv by
+    default) and reports the throughput on stderr.
+    """
+    path = sys.argv[1] if len(sys.argv) > 1 else "user_data.csv"
+    chunk_rows = int(sys.argv[2]) if len(sys.argv) > 2 else CHUNK_ROWS
+    logger = get_export_logger()
+
+    rows = 0
+    start = time.perf_counter()
+    for message in redacted_messages(path, chunk_rows):
+        logger.info(message)
+        rows += 1
+    elapsed = time.perf_counter() - start
+    print("{} rows in {:.2f}s: {:.0f} rows/s".format(
+        rows, elapsed, rows / elapsed if elapsed else 0), file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -3,17 +3,15 @@
 Encrypt password file
 """
 
-import bcrypt
+from hash_service import hash_service
 
 
 def hash_password(password: str) -> bytes:
     """
-    Hashes a password using bcrypt.
+    Hashes a password using bcrypt, in the bounded hashing pool.
+    Raises HashServiceBusy when the pool is saturated.
     """
-    # Generate a salt and hash the password
-    salt = bcrypt.gensalt()
-    hashed_password = bcrypt.hashpw(password.encode('utf-8'), salt)
-    return hashed_password
+    return hash_service().hash(password)
 
 
 if __name__ == "__main__":
@@ -5,11 +5,15 @@ Route module for the API
 
 from os import getenv
 from api.v1.views import app_views
-from flask import Flask, jsonify, abort, request
+from flask import Flask, jsonify, abort, request, g
+from models.base import reset_lookups
 from flask_cors import (CORS, cross_origin)
 import os
 
 
+# expose the lookup count of each request to clients, for debugging only
+API_DEBUG_LOOKUPS = getenv('API_DEBUG_LOOKUPS', '0') == '1'
+
 app = Flask(__name__)
 app.register_blueprint(app_views)
 CORS(app, resources={r"/api/v1/*": {"origins": "*"}})
@@ -50,14 +54,27 @@ def before_request() -> str:
         '/api/v1/unauthorized/',
         '/api/v1/forbidden/']
 
+    reset_lookups()
     if auth:
         if auth.require_auth(request.path, request_path_list):
             if auth.authorization_header(request) is None:
                 abort(401)
-            if auth.current_user(request) is None:
+            g.current_user = auth.request_user(request)
+            if g.current_user is None:
                 abort(403)
 
 
+@app.after_request
+def after_request(response):
+    """ counts the storage lookups made by the request """
+    g.store_lookups = reset_lookups()
+    app.logger.debug("%s %s: %d storage lookups", request.method,
+                     request.path, g.store_lookups)
+    if API_DEBUG_LOOKUPS:
+        response.headers['X-Store-Lookups'] = str(g.store_lookups)
+    return response
+
+
 if __name__ == "__main__":
     host = getenv("API_HOST", "0.0.0.0")
     port = getenv("API_PORT", "5000")
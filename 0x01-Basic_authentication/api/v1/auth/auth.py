@@ -45,3 +45,22 @@ class Auth:
             TypeVar('User'): The current user.
         """
         return None
+
+    def request_user(self, request=None) -> TypeVar('User'):
+        """
+        Resolves the current user once per request and keeps it on the
+        request, so later calls don't hit the storage again.
+
+        Args:
+            request: The Flask request object.
+
+        Returns:
+            TypeVar('User'): The current user.
+        """
+        if request is None:
+            return None
+        try:
+            return request.current_user
+        except AttributeError:
+            request.current_user = self.current_user(request)
+            return request.current_user
@@ -0,0 +1,16 @@
+#!/usr/bin/env python3
+""" Storage engine selected by STORE_BACKEND: 'json' (default) or 'sqlite',
+whose tables start from the JSON data found when they are created
+"""
+from os import getenv
+import atexit
+
+
+if getenv('STORE_BACKEND') == 'sqlite':
+    from models.engine.db_storage import DBStorage
+    storage = DBStorage(getenv('STORE_SQLITE_PATH', '.db.sqlite3'))
+else:
+    from models.engine.file_storage import FileStorage
+    storage = FileStorage()
+
+atexit.register(storage.flush)
@@ -0,0 +1,256 @@
+#!/usr/bin/env python3
+""" SQLite storage module: one table per class holding each object as a
+JSON document, plus one indexed column per attribute in its INDEXES.
+A table is filled from the .db_<Class>.json snapshot and journal of
+the JSON backend when it is created
+"""
+from contextlib import contextmanager
+from typing import TypeVar, List
+import json
+import logging
+import sqlite3
+import threading
+from models.engine.base_storage import Storage, parse_filters, \
+    parse_order
+from models.engine.file_storage import FileStorage
+
+
+# operator -> SQL condition on a column
+SQL_OPERATORS = {
+    'eq': "{} IS ?",
+    'ne': "{} IS NOT ?",
+    'lt': "{} < ?",
+    'lte': "{} <= ?",
+    'gt': "{} > ?",
+    'gte': "{} >= ?",
+    # a range rather than LIKE, which ignores case and the index
+    'prefix': "({0} >= ? AND {0} < ?)",
+}
+
+
+class DBStorage(Storage):
+    """ Storage backed by a SQLite database file
+    """
+
+    def __init__(self, db_path: str):
+        """ Initialize a storage writing to db_path
+        """
+        self.db_path = db_path
+        self._local = threading.local()
+        self._tables = set()
+        self._tables_lock = threading.Lock()
+
+    @property
+    def _connection(self) -> sqlite3.Connection:
+        """ Connection of the current thread
+        """
+        conn = getattr(self._local, 'connection', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, cached_statements=256)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection = conn
+            self._local.bulk = 0
+        return conn
+
+    def _table(self, cls: type) -> str:
+        """ Create the table and indexes of cls if needed, return its name
+        """
+        s_class = cls.__name__
+        if s_class in self._tables:
+            return s_class
+        with self._tables_lock:
+            conn = self._connection
+            with conn:
+                # one transaction, so that exactly one process creates
+                # the table and imports into it
+                if not conn.in_transaction:
+                    conn.execute("BEGIN IMMEDIATE")
+                created = conn.execute(
+                    "SELECT 1 FROM sqlite_master WHERE type = 'table' "
+                    "AND name = ?", (s_class,)).fetchone() is None
+                conn.execute('CREATE TABLE IF NOT EXISTS "{}" '
+                             '(id TEXT PRIMARY KEY, data TEXT NOT NULL)'
+                             .format(s_class))
+                columns = [row[1] for row in conn.execute(
+                    'PRAGMA table_info("{}")'.format(s_class))]
+                for attr, unique in cls.INDEXES.items():
+                    if attr not in columns:
+                        conn.execute('ALTER TABLE "{0}" ADD COLUMN "{1}"'
+                                     .format(s_class, attr))
+                        conn.execute('UPDATE "{0}" SET "{1}" = '
+                                     'json_extract(data, \'$.{1}\')'
+                                     .format(s_class, attr))
+                    conn.execute('CREATE {2}INDEX IF NOT EXISTS '
+                                 '"ix_{0}_{1}" ON "{0}" ("{1}")'
+                                 .format(s_class, attr,
+                                         'UNIQUE ' if unique else ''))
+                if created:
+                    self._import_json(cls)
+            self._tables.add(s_class)
+        return s_class
+
+    def _import_json(self, cls: type):
+        """ Insert the objects of cls stored by the JSON backend, in the
+        transaction creating its table
+        """
+        source = FileStorage()
+        with source._process_lock(cls, shared=True):
+            source._load(cls)
+        objs_json = source.objects(cls).to_json()
+        if not objs_json:
+            return
+        s_class = cls.__name__
+        attrs = list(cls.INDEXES)
+        columns = "".join(', "{}"'.format(attr) for attr in attrs)
+        self._connection.executemany(
+            'INSERT INTO "{0}" (id, data{1}) VALUES (?, ?{2})'
+            .format(s_class, columns, ", ?" * len(attrs)),
+            ([obj_id, json.dumps(obj_json)] +
+             [obj_json.get(attr) for attr in attrs]
+             for obj_id, obj_json in objs_json.items()))
+        logging.getLogger(__name__).info(
+            "Imported %d %s objects from the JSON store",
+            len(objs_json), s_class)
+
+    def _commit(self):
+        """ Commit the current thread's transaction unless in bulk()
+        """
+        if self._local.bulk == 0:
+            self._connection.commit()
+
+    def load(self, cls: type):
+        """ Make sure the table of cls exists: rows are read on demand
+        """
+        self._table(cls)
+
+    def save_all(self, cls: type):
+        """ Every save is already persisted: commit what is pending
+        """
+        self._table(cls)
+        self.flush()
+
+    def save(self, obj: TypeVar('Base')):
+        """ Insert or update obj
+        """
+        cls = obj.__class__
+        table = self._table(cls)
+        attrs = list(cls.INDEXES)
+        columns = "".join(', "{}"'.format(attr) for attr in attrs)
+        updates = "".join(', "{0}" = excluded."{0}"'.format(attr)
+                          for attr in attrs)
+        sql = ('INSERT INTO "{0}" (id, data{1}) VALUES (?, ?{2}) '
+               'ON CONFLICT(id) DO UPDATE SET data = excluded.data{3}'
+               .format(table, columns, ", ?" * len(attrs), updates))
+        values = [getattr(obj, attr, None) for attr in attrs]
+        try:
+            self._connection.execute(
+                sql, [obj.id, json.dumps(obj.to_json(True))] + values)
+        except sqlite3.IntegrityError as e:
+            raise ValueError("{} already exists: {}"
+                             .format(cls.__name__, e))
+        self._commit()
+
+    def remove(self, obj: TypeVar('Base')):
+        """ Delete obj
+        """
+        table = self._table(obj.__class__)
+        self._connection.execute(
+            'DELETE FROM "{}" WHERE id = ?'.format(table), (obj.id,))
+        self._commit()
+
+    def count(self, cls: type) -> int:
+        """ Count all objects
+        """
+        table = self._table(cls)
+        return self._connection.execute(
+            'SELECT COUNT(*) FROM "{}"'.format(table)).fetchone()[0]
+
+    def get(self, cls: type, obj_id: str) -> TypeVar('Base'):
+        """ Return one object by ID
+        """
+        table = self._table(cls)
+        row = self._connection.execute(
+            'SELECT data FROM "{}" WHERE id = ?'.format(table),
+            (obj_id,)).fetchone()
+        if row is None:
+            return None
+        return cls(**json.loads(row[0]))
+
+    def search(self, cls: type,
+               attributes: dict = {}) -> List[TypeVar('Base')]:
+        """ Filter on indexed columns in SQL and on the other
+        attributes once the objects are built
+        """
+        table = self._table(cls)
+        where, params, others = [], [], {}
+        for k, v in attributes.items():
+            if k in cls.INDEXES or k == 'id':
+                where.append('"{}" IS ?'.format(k))
+                params.append(v)
+            else:
+                others[k] = v
+        sql = 'SELECT data FROM "{}"'.format(table)
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        objs = (cls(**json.loads(row[0]))
+                for row in self._connection.execute(sql, params))
+        return [obj for obj in objs
+                if all(getattr(obj, k) == v for k, v in others.items())]
+
+    def query(self, cls: type, filters: dict = {}, order_by: str = None,
+              limit: int = None, offset: int = 0) -> List[TypeVar('Base')]:
+        """ Page of the objects matching filters, entirely evaluated by
+        SQLite: indexed attributes use their column, the others
+        json_extract() from the document
+        """
+        table = self._table(cls)
+
+        def column(attr):
+            if attr == 'id' or attr in cls.INDEXES:
+                return '"{}"'.format(attr)
+            return "json_extract(data, '$.{}')".format(attr)
+
+        where, params = [], []
+        for attr, op, value in parse_filters(filters):
+            if op == 'in':
+                values = list(value)
+                where.append("{} IN ({})".format(
+                    column(attr), ", ".join("?" * len(values))))
+                params += values
+            elif op == 'prefix':
+                where.append(SQL_OPERATORS[op].format(column(attr)))
+                params += [value, value + "\U0010ffff"]
+            else:
+                where.append(SQL_OPERATORS[op].format(column(attr)))
+                params.append(value)
+        sql = 'SELECT data FROM "{}"'.format(table)
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        if order_by:
+            attr, descending = parse_order(order_by)
+            sql += " ORDER BY {}{}".format(column(attr),
+                                           " DESC" if descending else "")
+        if limit is not None or offset:
+            sql += " LIMIT ? OFFSET ?"
+            params += [-1 if limit is None else limit, offset]
+        return [cls(**json.loads(row[0]))
+                for row in self._connection.execute(sql, params)]
+
+    def flush(self):
+        """ Commit the current thread's transaction
+        """
+        self._connection.commit()
+
+    @contextmanager
+    def bulk(self):
+        """ Run every write of the block in a single transaction
+        """
+        self._connection
+        self._local.bulk += 1
+        try:
+            yield
+        finally:
+            self._local.bulk -= 1
+            if self._local.bulk == 0:
+                self.flush()
@@ -0,0 +1,892 @@
+#!/usr/bin/env python3
+""" JSON file storage module: objects live in memory and are persisted
+to one .db_<Class>.json file per class
+"""
+from collections.abc import MutableMapping
+from contextlib import contextmanager
+from datetime import datetime
+from functools import partial
+from itertools import islice
+from typing import TypeVar, List, Optional, Iterator, Tuple, Callable
+from os import getenv, path
+import heapq
+import json
+import logging
+import os
+import re
+import shutil
+import tempfile
+import threading
+import time
+from models.engine.base_storage import Storage, QUERY_OPERATORS, \
+    parse_filters, parse_order
+from models.engine.rwlock import ReadWriteLock
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+
+# 'snapshot' rewrites .db_<Class>.json on every mutation, 'journal'
+# appends one record to .db_<Class>.log and compacts in the background
+STORE_MODE = getenv('STORE_MODE', 'snapshot')
+STORE_COMPACT_EVERY = int(getenv('STORE_COMPACT_EVERY', '1000'))
+
+# group commit: when either is set, mutations only mark their class dirty
+# and are written at most once per interval (seconds) or per N mutations
+STORE_FLUSH_INTERVAL = float(getenv('STORE_FLUSH_INTERVAL', '0'))
+STORE_FLUSH_EVERY = int(getenv('STORE_FLUSH_EVERY', '0'))
+
+# durability of journal writes and snapshot renames: 'always' fsyncs
+# every one, 'interval' at most once per STORE_FSYNC_INTERVAL seconds per
+# file and 'never' leaves it to the OS. A new snapshot is always fsynced
+# before it replaces the old one, so a crash can't leave it truncated
+STORE_FSYNC = getenv('STORE_FSYNC', 'never')
+STORE_FSYNC_INTERVAL = float(getenv('STORE_FSYNC_INTERVAL', '1'))
+# file path -> time.monotonic() of its last fsync
+LAST_FSYNC = {}
+# mode of new files, mkstemp creating them owner-only
+UMASK = os.umask(0)
+os.umask(UMASK)
+
+# STORE_SHARED=1 lets several processes share the files: writes hold an
+# exclusive lock on .db_<Class>.lock and every access first catches up
+# with what other processes wrote (replaying only the new journal records
+# unless the snapshot changed). Group commit is disabled in this mode
+STORE_SHARED = getenv('STORE_SHARED', '0') == '1'
+
+# STORE_LAZY_LOAD=0 builds every object while loading instead of on first
+# access
+STORE_LAZY_LOAD = getenv('STORE_LAZY_LOAD', '1') != '0'
+LOAD_CHUNK_SIZE = 1 << 16
+JSON_WHITESPACE = re.compile(r'[ \t\n\r]*')
+
+
+class LazyObjects(MutableMapping):
+    """ id -> object mapping holding loaded records as their JSON bytes
+    until they are first accessed: a record costs its text, where the
+    decoded dictionary or the built object cost an object per value
+    """
+
+    def __init__(self, cls: type):
+        """ Initialize an empty mapping of cls objects
+        """
+        self._cls = cls
+        self._items = {}
+        self._build_lock = threading.Lock()
+
+    def __getitem__(self, obj_id: str) -> TypeVar('Base'):
+        """ Return an object, building it from its record if needed
+        """
+        obj = self._items[obj_id]
+        if type(obj) is not bytes:
+            return obj
+        built = self._cls(**json.loads(obj))
+        with self._build_lock:
+            # concurrent readers must all get the same object
+            obj = self._items[obj_id]
+            if type(obj) is bytes:
+                self._items[obj_id] = obj = built
+        return obj
+
+    def __setitem__(self, obj_id: str, obj):
+        """ Store an object, or a record given as a dictionary or as its
+        JSON bytes
+        """
+        if type(obj) is dict:
+            obj = json.dumps(obj).encode('utf-8')
+        self._items[obj_id] = obj
+
+    def peek(self, obj_id: str):
+        """ The object if built, else its decoded record, without building
+        it; None if there is none
+        """
+        obj = self._items.get(obj_id)
+        if type(obj) is bytes:
+            return json.loads(obj)
+        return obj
+
+    def __delitem__(self, obj_id: str):
+        """ Remove an object
+        """
+        del self._items[obj_id]
+
+    def __contains__(self, obj_id) -> bool:
+        """ Membership without building the object
+        """
+        return obj_id in self._items
+
+    def __iter__(self) -> Iterator[str]:
+        """ Iterate over ids
+        """
+        return iter(self._items)
+
+    def __len__(self) -> int:
+        """ Number of objects, built or not
+        """
+        return len(self._items)
+
+    def to_json(self) -> dict:
+        """ Serialize every object, decoding the records not built yet
+        """
+        return {obj_id: json.loads(obj) if type(obj) is bytes
+                else obj.to_json(True)
+                for obj_id, obj in list(self._items.items())}
+
+    def materialize(self):
+        """ Build every object still held as a record
+        """
+        for obj_id in list(self._items):
+            self[obj_id]
+
+
+def _iter_json_object(f) -> Iterator[Tuple[str, dict, str]]:
+    """ Yield the (key, value, value text) of the top level JSON object in
+    f, reading it by chunks instead of parsing the whole file at once
+    """
+    decoder = json.JSONDecoder()
+    buf, pos, eof = "", 0, False
+
+    def fill(pos):
+        """ Drop the consumed prefix of buf and read one more chunk
+        """
+        nonlocal buf, eof
+        chunk = f.read(LOAD_CHUNK_SIZE)
+        eof = chunk == ""
+        buf = buf[pos:] + chunk
+        return 0
+
+    def skip(pos):
+        """ Skip whitespace, reading more as needed
+        """
+        while True:
+            pos = JSON_WHITESPACE.match(buf, pos).end()
+            if pos < len(buf) or eof:
+                return pos
+            pos = fill(pos)
+
+    def decode(pos):
+        """ Decode the next JSON value, reading more as needed; return
+        it, where it starts and where it ends
+        """
+        while True:
+            try:
+                value, end = decoder.raw_decode(buf, pos)
+                # a value ending the buffer may be a truncated number
+                if end < len(buf) or eof:
+                    return value, pos, end
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+            pos = fill(pos)
+
+    pos = skip(pos)
+    if buf[pos:pos + 1] != '{':
+        raise ValueError("{} is not a JSON object".format(f.name))
+    pos = skip(pos + 1)
+    if buf[pos:pos + 1] == '}':
+        return
+    while True:
+        key, _, pos = decode(pos)
+        pos = skip(pos)
+        if buf[pos:pos + 1] != ':':
+            raise ValueError("Expecting ':' in {}".format(f.name))
+        value, start, pos = decode(skip(pos + 1))
+        yield key, value, buf[start:pos]
+        pos = skip(pos)
+        if buf[pos:pos + 1] == '}':
+            return
+        if buf[pos:pos + 1] != ',':
+            raise ValueError("Expecting ',' in {}".format(f.name))
+        pos = skip(pos + 1)
+        if pos > LOAD_CHUNK_SIZE:
+            pos = fill(pos)
+
+
+def _fsync_due(file_path: str) -> bool:
+    """ Whether STORE_FSYNC asks for an fsync of file_path now
+    """
+    if STORE_FSYNC == 'never':
+        return False
+    now = time.monotonic()
+    if STORE_FSYNC == 'interval' and \
+            now - LAST_FSYNC.get(file_path, 0) < STORE_FSYNC_INTERVAL:
+        return False
+    LAST_FSYNC[file_path] = now
+    return True
+
+
+def _fsync(f, file_path: str):
+    """ Flush f to disk if STORE_FSYNC asks for it
+    """
+    if _fsync_due(file_path):
+        f.flush()
+        os.fsync(f.fileno())
+
+
+def _signature(file_path: str) -> Optional[Tuple[int, int, int]]:
+    """ (inode, mtime, size) of a file, None if it doesn't exist
+    """
+    try:
+        st = os.stat(file_path)
+    except FileNotFoundError:
+        return None
+    return (st.st_ino, st.st_mtime_ns, st.st_size)
+
+
+def _write_snapshot(file_path: str, objs_json: dict):
+    """ Atomically replace file_path with objs_json: readers and crashes
+    see either the old or the new snapshot, never a truncated one. The
+    new file keeps the mode of the old one
+    """
+    try:
+        mode = os.stat(file_path).st_mode & 0o777
+    except FileNotFoundError:
+        mode = 0o666 & ~UMASK
+    fd, tmp_path = tempfile.mkstemp(
+        dir=path.dirname(path.abspath(file_path)),
+        prefix=path.basename(file_path) + ".")
+    try:
+        with os.fdopen(fd, 'w') as f:
+            json.dump(objs_json, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.chmod(tmp_path, mode)
+        os.replace(tmp_path, file_path)
+    except BaseException:
+        if path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    if _fsync_due(path.dirname(path.abspath(file_path))):
+        _fsync_dir(file_path)
+
+
+def _fsync_dir(file_path: str):
+    """ Flush the directory entry of file_path to disk, making a rename
+    to it durable
+    """
+    if not hasattr(os, 'O_DIRECTORY'):
+        return
+    fd = os.open(path.dirname(path.abspath(file_path)),
+                 os.O_RDONLY | os.O_DIRECTORY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+class FileStorage(Storage):
+    """ Storage keeping every object in memory, indexed on the attributes
+    declared in the INDEXES of its class
+
+    Reads share `lock` and mutations hold it exclusively, but journal
+    writes happen once it is released. Locks are always taken in this
+    order: flush_write_lock, the .db_<Class>.lock file lock, file_lock,
+    lock, journal_lock, flush_lock, journal_queue_lock; objects_lock is
+    never held while taking another one
+    """
+
+    def __init__(self):
+        """ Initialize an empty storage
+        """
+        # class name -> LazyObjects
+        self.data = {}
+        # class name -> {'objects': count, 'seconds': duration} of the
+        # last load
+        self.load_stats = {}
+        # class name -> attribute -> value -> ids (a dict used as an
+        # ordered set)
+        self.indexes = {}
+        # class name -> id -> {attribute: value} as last indexed
+        self.indexed_values = {}
+        # class name -> number of records in the journal since last
+        # compaction
+        self.journal_sizes = {}
+        self.compacting = set()
+        self.journal_lock = threading.RLock()
+        # class name -> journal records applied in memory, in order, and
+        # waiting for their writer to release the write lock
+        self.journal_queue = {}
+        self.journal_queue_lock = threading.Lock()
+        # class name -> (class, journal records not written yet)
+        self.pending = {}
+        self.pending_state = {'count': 0, 'bulk': 0, 'flusher': None}
+        self.flush_lock = threading.RLock()
+        # serializes flushes so queued records are written in order
+        self.flush_write_lock = threading.Lock()
+        # serializes snapshot writes so an older one can't land last, and
+        # loads with compactions so no file is swapped while being read
+        self.file_lock = threading.RLock()
+        self.lock = ReadWriteLock()
+        self.objects_lock = threading.Lock()
+        # class name -> files as last read or written by this process:
+        # {'snapshot': signature, 'journal': (inode, offset)}
+        self.file_states = {}
+        self._local = threading.local()
+
+    def objects(self, cls: type) -> LazyObjects:
+        """ The id -> object mapping of cls
+        """
+        s_class = cls.__name__
+        objs = self.data.get(s_class)
+        if objs is None:
+            with self.objects_lock:
+                objs = self.data.get(s_class)
+                if objs is None:
+                    self._reset_indexes(cls)
+                    self.data[s_class] = objs = LazyObjects(cls)
+        return objs
+
+    def load(self, cls: type):
+        """ Load all objects from file, then replay the journal
+        """
+        self.flush()
+        with self._process_lock(cls, shared=True):
+            self._load(cls)
+        if STORE_MODE == 'journal':
+            self._maybe_compact(cls)
+
+    def _load(self, cls: type):
+        """ Body of load(), called holding the file lock
+        """
+        start = time.perf_counter()
+        s_class = cls.__name__
+        file_path = ".db_{}.json".format(s_class)
+        with self.file_lock, self.lock.write():
+            snapshot = _signature(file_path)
+            self.data[s_class] = LazyObjects(cls)
+            self._reset_indexes(cls)
+            if path.exists(file_path):
+                with open(file_path, 'r') as f:
+                    for obj_id, obj_json, text in _iter_json_object(f):
+                        # lazily, only the text is kept, not the values
+                        self.data[s_class][obj_id] = \
+                            text.encode('utf-8') if STORE_LAZY_LOAD \
+                            else cls(**obj_json)
+                        self._index_add(cls, obj_json)
+
+            replayed = 0
+            for journal_path in self._journal_paths(cls):
+                count, offset = self._replay_journal(cls, journal_path)
+                replayed += count
+            self.journal_sizes[s_class] = replayed
+            journal = _signature(journal_path)
+            self.file_states[s_class] = {
+                'snapshot': snapshot,
+                'journal': (journal[0], offset) if journal else None}
+            if not STORE_LAZY_LOAD:
+                self.data[s_class].materialize()
+        self.load_stats[s_class] = {
+            'objects': len(self.data[s_class]),
+            'seconds': time.perf_counter() - start}
+        logging.getLogger(__name__).info(
+            "Loaded %d %s objects in %.3fs",
+            self.load_stats[s_class]['objects'], s_class,
+            self.load_stats[s_class]['seconds'])
+
+    @contextmanager
+    def _process_lock(self, cls: type, shared: bool = False):
+        """ Hold the .db_<Class>.lock file lock when STORE_SHARED is on.
+        Reentrant within a thread; the outermost acquisition decides
+        whether it is shared
+        """
+        held = getattr(self._local, 'process_locks', None)
+        if held is None:
+            held = self._local.process_locks = set()
+        s_class = cls.__name__
+        if not STORE_SHARED or fcntl is None or s_class in held:
+            yield
+            return
+        with open(".db_{}.lock".format(s_class), 'a') as f:
+            fcntl.flock(f, fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+            held.add(s_class)
+            try:
+                yield
+            finally:
+                held.discard(s_class)
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def _refresh(self, cls: type):
+        """ Catch up with the writes other processes made to the files of
+        cls: replay new journal records, or reload everything if the
+        snapshot was rewritten
+        """
+        if not STORE_SHARED:
+            return
+        s_class = cls.__name__
+        snapshot = _signature(".db_{}.json".format(s_class))
+        journal_path = ".db_{}.log".format(s_class)
+        journal = _signature(journal_path)
+        state = self.file_states.get(s_class)
+        seen = state['journal'] if state else None
+        if state is None or snapshot != state['snapshot'] or \
+                (seen and (journal is None or journal[0] != seen[0]
+                           or journal[2] < seen[1])):
+            with self._process_lock(cls, shared=True):
+                self._load(cls)
+        elif journal and journal[2] > (seen[1] if seen else 0):
+            with self.lock.write():
+                seen = self.file_states[s_class]['journal']
+                count, offset = self._replay_journal(
+                    cls, journal_path, seen[1] if seen else 0)
+                self.journal_sizes[s_class] = \
+                    self.journal_sizes.get(s_class, 0) + count
+                self.file_states[s_class]['journal'] = (journal[0], offset)
+
+    def save_all(self, cls: type):
+        """ Save all objects to file
+        """
+        s_class = cls.__name__
+        file_path = ".db_{}.json".format(s_class)
+        with self._process_lock(cls), self.file_lock:
+            self._refresh(cls)
+            with self.lock.read():
+                objs_json = self.objects(cls).to_json()
+            _write_snapshot(file_path, objs_json)
+            if s_class in self.file_states:
+                self.file_states[s_class]['snapshot'] = \
+                    _signature(file_path)
+
+    def save(self, obj: TypeVar('Base')):
+        """ Save obj
+        """
+        cls = obj.__class__
+        with self._process_lock(cls):
+            self._refresh(cls)
+            with self.lock.write():
+                # serialized in the order the records are queued, so the
+                # last one journaled holds what memory holds
+                record = {'op': 'save', 'id': obj.id,
+                          'obj': obj.to_json(True)}
+                objs = self.objects(cls)
+                self._check_unique(cls, obj)
+                objs[obj.id] = obj
+                self._index_add(cls, obj)
+                then = self._persist(cls, record)
+            if then is not None:
+                then()
+
+    def remove(self, obj: TypeVar('Base')):
+        """ Remove obj
+        """
+        cls = obj.__class__
+        then = None
+        with self._process_lock(cls):
+            self._refresh(cls)
+            with self.lock.write():
+                objs = self.objects(cls)
+                if objs.get(obj.id) is not None:
+                    del objs[obj.id]
+                    self._index_remove(cls, obj.id)
+                    then = self._persist(cls, {'op': 'remove',
+                                               'id': obj.id})
+            if then is not None:
+                then()
+
+    def reindex(self, obj: TypeVar('Base')):
+        """ Re-index a stored object whose indexed attribute was just set,
+        so lookups see its in-memory value, saved or not, as a scan would
+        """
+        cls = obj.__class__
+        objs = self.data.get(cls.__name__)
+        # objects being built or not stored yet have nothing to update
+        if objs is None or objs._items.get(getattr(obj, 'id', None)) \
+                is not obj:
+            return
+        with self.lock.write():
+            if objs._items.get(obj.id) is obj:
+                self._index_add(cls, obj)
+
+    def count(self, cls: type) -> int:
+        """ Count all objects
+        """
+        self._refresh(cls)
+        with self.lock.read():
+            return len(self.objects(cls))
+
+    def get(self, cls: type, obj_id: str) -> TypeVar('Base'):
+        """ Return one object by ID
+        """
+        self._refresh(cls)
+        with self.lock.read():
+            return self.objects(cls).get(obj_id)
+
+    def search(self, cls: type,
+               attributes: dict = {}) -> List[TypeVar('Base')]:
+        """ Search all objects with matching attributes
+        """
+        def _search(obj):
+            if len(attributes) == 0:
+                return True
+            for k, v in attributes.items():
+                if (getattr(obj, k) != v):
+                    return False
+            return True
+
+        self._refresh(cls)
+        with self.lock.read():
+            objs = self.objects(cls)
+            ids = self._index_candidates(
+                cls, [(k, 'eq', v) for k, v in attributes.items()])
+            if ids is None:
+                return list(filter(_search, list(objs.values())))
+            found = [objs.get(obj_id) for obj_id in ids]
+        return [obj for obj in found if obj is not None and _search(obj)]
+
+    def query(self, cls: type, filters: dict = {}, order_by: str = None,
+              limit: int = None, offset: int = 0) -> List[TypeVar('Base')]:
+        """ Page of the objects matching filters. Conditions are tested on
+        the raw records of objects not built yet, and only the objects of
+        the page are built; with a limit, sorting keeps offset + limit
+        entries in a heap instead of sorting every match
+        """
+        from models.base import TIMESTAMP_FORMAT
+        conditions = parse_filters(filters)
+        order = parse_order(order_by) if order_by else None
+
+        def value(obj, attr):
+            if type(obj) is dict:
+                return obj.get(attr)
+            value = getattr(obj, attr, None)
+            if isinstance(value, datetime):
+                return value.strftime(TIMESTAMP_FORMAT)
+            return value
+
+        def matches(obj):
+            for attr, op, expected in conditions:
+                try:
+                    if not QUERY_OPERATORS[op](value(obj, attr), expected):
+                        return False
+                except TypeError:
+                    return False
+            return True
+
+        self._refresh(cls)
+        with self.lock.read():
+            objs = self.objects(cls)
+            ids = self._index_candidates(cls, conditions)
+            if ids is None:
+                ids = objs.keys()
+            items = ((obj_id, objs.peek(obj_id)) for obj_id in ids)
+            found = (obj_id for obj_id, obj in items
+                     if obj is not None and matches(obj))
+            end = None if limit is None else offset + limit
+            if order is not None:
+                attr, descending = order
+
+                def key(obj_id):
+                    # SQLite's order of mixed types: NULL, numbers, text,
+                    # then anything else, so no two values fail to compare
+                    v = value(objs.peek(obj_id), attr)
+                    if v is None:
+                        return (0, 0)
+                    if isinstance(v, (int, float)):
+                        return (1, v)
+                    if isinstance(v, str):
+                        return (2, v)
+                    return (3, repr(v))
+                if end is None:
+                    found = sorted(found, key=key, reverse=descending)
+                elif descending:
+                    found = heapq.nlargest(end, found, key=key)
+                else:
+                    found = heapq.nsmallest(end, found, key=key)
+            page = islice(found, offset, end)
+            return [objs[obj_id] for obj_id in page]
+
+    def _persist(self, cls: type, record: dict) -> Optional[Callable]:
+        """ Journal a mutation, or queue it when group commit is on.
+        Called holding the write lock so records are queued in the order
+        the mutations were applied; returns what is left to do once the
+        lock is released, the disk I/O included
+        """
+        s_class = cls.__name__
+        state = self.pending_state
+        with self.flush_lock:
+            deferred = not STORE_SHARED and (
+                state['bulk'] > 0 or STORE_FLUSH_INTERVAL > 0
+                or STORE_FLUSH_EVERY > 1)
+            if deferred:
+                self.pending.setdefault(s_class, (cls, []))[1].append(record)
+                state['count'] += 1
+                due = state['bulk'] == 0 and STORE_FLUSH_EVERY > 0 \
+                    and state['count'] >= STORE_FLUSH_EVERY
+            elif STORE_MODE == 'journal':
+                # records of a bulk block that ended but wasn't flushed
+                # yet are older than this one: queue them first
+                older = self.pending.pop(s_class, (cls, []))[1]
+                state['count'] -= len(older)
+                self._journal_queue(cls, *older, record)
+        if not deferred and STORE_MODE == 'journal':
+            return partial(self._journal_drain, cls)
+        elif not deferred:
+            return partial(self.save_all, cls)
+        elif due:
+            return self.flush
+        elif STORE_FLUSH_INTERVAL > 0:
+            self._start_flusher()
+        return None
+
+    def flush(self):
+        """ Write every pending mutation of every class. Journal records
+        go through journal_queue, as those of the other saves, so they
+        reach the file in the order they were applied
+        """
+        with self.flush_write_lock:
+            with self.flush_lock:
+                pending = list(self.pending.values())
+                self.pending.clear()
+                self.pending_state['count'] = 0
+                if STORE_MODE == 'journal':
+                    for cls, records in pending:
+                        self._journal_queue(cls, *records)
+            for cls, records in pending:
+                if STORE_MODE == 'journal':
+                    self._journal_drain(cls)
+                else:
+                    self.save_all(cls)
+
+    @contextmanager
+    def bulk(self):
+        """ Defer all writes until the outermost bulk block exits
+        """
+        with self.flush_lock:
+            self.pending_state['bulk'] += 1
+        try:
+            yield
+        finally:
+            with self.flush_lock:
+                self.pending_state['bulk'] -= 1
+                done = self.pending_state['bulk'] == 0
+            if done:
+                self.flush()
+
+    def _start_flusher(self):
+        """ Start the thread flushing every STORE_FLUSH_INTERVAL seconds
+        """
+        with self.flush_lock:
+            if self.pending_state['flusher'] is not None:
+                return
+            self.pending_state['flusher'] = threading.Thread(
+                target=self._flush_forever, daemon=True)
+            self.pending_state['flusher'].start()
+
+    def _flush_forever(self):
+        """ Body of the flusher thread
+        """
+        while True:
+            time.sleep(STORE_FLUSH_INTERVAL)
+            if self.pending_state['bulk'] == 0:
+                self.flush()
+
+    def _journal_paths(self, cls: type) -> List[str]:
+        """ Journal files in replay order: the one being compacted first
+        """
+        s_class = cls.__name__
+        return [".db_{}.log.compacting".format(s_class),
+                ".db_{}.log".format(s_class)]
+
+    def _replay_journal(self, cls: type, journal_path: str,
+                        offset: int = 0) -> Tuple[int, int]:
+        """ Apply the records of a journal file from offset on, return
+        how many and the offset following the last complete one
+        """
+        objs = self.objects(cls)
+        if not path.exists(journal_path):
+            return 0, 0
+        replayed = 0
+        with open(journal_path, 'rb') as f:
+            f.seek(offset)
+            for line in f:
+                if not line.endswith(b"\n"):
+                    # still being written, or torn by a crash
+                    break
+                offset += len(line)
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # torn write left by a crash
+                    continue
+                if record.get('op') == 'save':
+                    objs[record['id']] = record['obj']
+                    self._index_add(cls, record['obj'])
+                elif record.get('op') == 'remove':
+                    objs.pop(record['id'], None)
+                    self._index_remove(cls, record['id'])
+                replayed += 1
+        return replayed, offset
+
+    def _journal_queue(self, cls: type, *records: dict):
+        """ Queue records for the journal of the class, holding
+        flush_lock so pending and immediate records queue in order
+        """
+        with self.journal_queue_lock:
+            self.journal_queue.setdefault(cls.__name__, []).extend(records)
+
+    def _journal_drain(self, cls: type):
+        """ Append the queued records of the class. Whoever drains first
+        writes the records queued by the others too, in order; once a
+        drain returns, the caller's own record is written
+        """
+        with self.journal_lock:
+            with self.journal_queue_lock:
+                records = self.journal_queue.pop(cls.__name__, [])
+            if records:
+                self._journal_append(cls, *records)
+
+    def _journal_append(self, cls: type, *records: dict):
+        """ Append records to the journal of the class in one write
+        """
+        s_class = cls.__name__
+        lines = "".join(json.dumps(record) + "\n" for record in records)
+        lines = lines.encode('utf-8')
+        with self.journal_lock:
+            journal_path = ".db_{}.log".format(s_class)
+            with open(journal_path, 'a+b') as f:
+                end = f.seek(0, os.SEEK_END)
+                if end > 0:
+                    f.seek(end - 1)
+                    if f.read(1) != b"\n":
+                        # a crash tore the last record: end its line so
+                        # ours isn't glued to it and lost on replay
+                        lines = b"\n" + lines
+                f.write(lines)
+                _fsync(f, journal_path)
+                f.flush()
+                st = os.fstat(f.fileno())
+            if STORE_SHARED and s_class in self.file_states:
+                # we hold the file lock and were caught up before writing
+                self.file_states[s_class]['journal'] = (st.st_ino,
+                                                        st.st_size)
+            self.journal_sizes[s_class] = \
+                self.journal_sizes.get(s_class, 0) + len(records)
+        self._maybe_compact(cls)
+
+    def _maybe_compact(self, cls: type):
+        """ Start a background compaction once the journal is long enough
+        """
+        s_class = cls.__name__
+        with self.journal_lock:
+            if self.journal_sizes.get(s_class, 0) < STORE_COMPACT_EVERY \
+                    or s_class in self.compacting:
+                return
+            self.compacting.add(s_class)
+        threading.Thread(target=self.compact, args=(cls,),
+                         daemon=True).start()
+
+    def compact(self, cls: type):
+        """ Fold the journal into the .db_<Class>.json snapshot
+        """
+        s_class = cls.__name__
+        journal_path, compacting_path = (".db_{}.log".format(s_class),
+                                         ".db_{}.log.compacting"
+                                         .format(s_class))
+        try:
+            with self._process_lock(cls), self.file_lock:
+                self._refresh(cls)
+                with self.lock.read(), self.journal_lock:
+                    if path.exists(journal_path) \
+                            and path.exists(compacting_path):
+                        # left over by an interrupted compaction
+                        with open(journal_path, 'r') as src, \
+                                open(compacting_path, 'a') as dst:
+                            shutil.copyfileobj(src, dst)
+                        os.remove(journal_path)
+                    elif path.exists(journal_path):
+                        os.replace(journal_path, compacting_path)
+                    self.journal_sizes[s_class] = 0
+                    objs_json = self.objects(cls).to_json()
+                _write_snapshot(".db_{}.json".format(s_class), objs_json)
+                if path.exists(compacting_path):
+                    os.remove(compacting_path)
+                if s_class in self.file_states:
+                    self.file_states[s_class] = {
+                        'snapshot': _signature(".db_{}.json"
+                                               .format(s_class)),
+                        'journal': None}
+        finally:
+            with self.journal_lock:
+                self.compacting.discard(s_class)
+
+    def _reset_indexes(self, cls: type):
+        """ Drop every index entry of the class
+        """
+        s_class = cls.__name__
+        self.indexes[s_class] = {attr: {} for attr in cls.INDEXES}
+        self.indexed_values[s_class] = {}
+
+    def _index_add(self, cls: type, obj):
+        """ (Re)index an object, or a raw record, under its current
+        attribute values
+        """
+        if not cls.INDEXES:
+            return
+        s_class = cls.__name__
+        raw = type(obj) is dict
+        obj_id = obj['id'] if raw else obj.id
+        self._index_remove(cls, obj_id)
+        values = {}
+        for attr in cls.INDEXES:
+            value = obj.get(attr) if raw else getattr(obj, attr, None)
+            try:
+                ids = self.indexes[s_class][attr].setdefault(value, {})
+            except TypeError:
+                continue
+            ids[obj_id] = None
+            values[attr] = value
+        self.indexed_values[s_class][obj_id] = values
+
+    def _index_remove(self, cls: type, obj_id: str):
+        """ Remove the index entries of an object
+        """
+        s_class = cls.__name__
+        values = self.indexed_values.get(s_class, {}).pop(obj_id, None)
+        if values is None:
+            return
+        for attr, value in values.items():
+            ids = self.indexes[s_class][attr].get(value)
+            if ids is None:
+                continue
+            ids.pop(obj_id, None)
+            if len(ids) == 0:
+                del self.indexes[s_class][attr][value]
+
+    def _index_candidates(self, cls: type,
+                          conditions: list) -> Optional[List[str]]:
+        """ Candidate ids for the 'eq' and 'in' conditions on indexed
+        attributes, None if there are none
+        """
+        s_class = cls.__name__
+        candidates = []
+        for attr, op, expected in conditions:
+            if attr not in cls.INDEXES or op not in ('eq', 'in'):
+                continue
+            try:
+                values = [expected] if op == 'eq' else expected
+                ids = {}
+                for v in values:
+                    ids.update(self.indexes[s_class][attr].get(v, {}))
+            except TypeError:
+                continue
+            candidates.append(ids)
+        if len(candidates) == 0:
+            return None
+        candidates.sort(key=len)
+        return [obj_id for obj_id in candidates[0]
+                if all(obj_id in ids for ids in candidates[1:])]
+
+    def _check_unique(self, cls: type, obj: TypeVar('Base')):
+        """ Raise ValueError if obj breaks a unique index
+        """
+        s_class = cls.__name__
+        for attr, unique in cls.INDEXES.items():
+            value = getattr(obj, attr, None)
+            if not unique or value is None:
+                continue
+            try:
+                ids = self.indexes[s_class][attr].get(value, {})
+            except TypeError:
+                continue
+            if any(obj_id != obj.id for obj_id in ids):
+                raise ValueError("{} with {} {} already exists"
+                                 .format(s_class, attr, value))
@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+""" Password hashing module: hashes are stored as '<scheme>$<hash>' so
+schemes and their parameters can change while old hashes still verify
+"""
+from os import getenv
+from typing import Optional
+import base64
+import hashlib
+import hmac
+try:
+    import bcrypt
+except ImportError:
+    bcrypt = None
+
+
+# scheme of the new hashes: bcrypt (see requirements.txt) or sha256
+PASSWORD_SCHEME = getenv('PASSWORD_SCHEME', 'bcrypt')
+BCRYPT_ROUNDS = int(getenv('BCRYPT_ROUNDS', '12'))
+# bytes of password bcrypt reads: longer ones are hashed down first
+BCRYPT_MAX_BYTES = 72
+
+
+class Sha256Hasher():
+    """ Unsalted SHA256, the legacy scheme: kept to verify old hashes
+    """
+    name = 'sha256'
+
+    def hash(self, pwd: str) -> str:
+        """ Hex digest of pwd
+        """
+        return hashlib.sha256(pwd.encode()).hexdigest().lower()
+
+    def verify(self, pwd: str, hashed: str) -> bool:
+        """ Whether pwd hashes to hashed
+        """
+        return hmac.compare_digest(self.hash(pwd), hashed)
+
+    def needs_rehash(self, hashed: str) -> bool:
+        """ SHA256 has no parameter to tune
+        """
+        return False
+
+
+class BcryptHasher():
+    """ Salted bcrypt with a configurable cost factor
+    """
+    name = 'bcrypt'
+
+    def __init__(self, rounds: int = BCRYPT_ROUNDS):
+        """ Initialize a hasher of cost factor rounds
+        """
+        self.rounds = rounds
+
+    @staticmethod
+    def _secret(pwd: str) -> bytes:
+        """ Bytes of pwd given to bcrypt: passwords over its 72 bytes
+        are replaced by their base64 SHA256 digest rather than truncated
+        (or rejected, by bcrypt 5)
+        """
+        secret = pwd.encode()
+        if len(secret) > BCRYPT_MAX_BYTES:
+            secret = base64.b64encode(hashlib.sha256(secret).digest())
+        return secret
+
+    def hash(self, pwd: str) -> str:
+        """ bcrypt hash of pwd
+        """
+        salt = bcrypt.gensalt(self.rounds)
+        return bcrypt.hashpw(self._secret(pwd), salt).decode()
+
+    def verify(self, pwd: str, hashed: str) -> bool:
+        """ Whether pwd matches hashed
+        """
+        return bcrypt.checkpw(self._secret(pwd), hashed.encode())
+
+    def needs_rehash(self, hashed: str) -> bool:
+        """ Whether hashed ('$2b$<rounds>$...') used another cost factor
+        """
+        return hashed.split('$')[2] != "{:02d}".format(self.rounds)
+
+
+HASHERS = {'sha256': Sha256Hasher()}
+if bcrypt is not None:
+    HASHERS['bcrypt'] = BcryptHasher()
+if PASSWORD_SCHEME not in HASHERS:
+    # fail at startup rather than on the first password set
+    raise ValueError("PASSWORD_SCHEME {} is unknown or its package is not "
+                     "installed".format(PASSWORD_SCHEME))
+
+
+def _split(hashed: str) -> tuple:
+    """ (hasher, hash) of a stored value, untagged ones being legacy
+    SHA256 hex digests
+    """
+    scheme, sep, value = hashed.partition('$')
+    if not sep:
+        return HASHERS['sha256'], hashed
+    return HASHERS.get(scheme), value
+
+
+def hash_password(pwd: str) -> str:
+    """ Tagged hash of pwd with the configured scheme
+    """
+    hasher = HASHERS[PASSWORD_SCHEME]
+    return "{}${}".format(hasher.name, hasher.hash(pwd))
+
+
+def verify_password(pwd: str, hashed: Optional[str]) -> bool:
+    """ Whether pwd matches the stored value hashed
+    """
+    if hashed is None:
+        return False
+    hasher, value = _split(hashed)
+    if hasher is None:
+        return False
+    return hasher.verify(pwd, value)
+
+
+def needs_rehash(hashed: str) -> bool:
+    """ Whether hashed was made with another scheme or parameters than
+    the configured ones
+    """
+    hasher, value = _split(hashed)
+    if hasher is None or hasher.name != PASSWORD_SCHEME:
+        return True
+    return hasher.needs_rehash(value)
@@ -1,14 +1,18 @@
 #!/usr/bin/env python3
 """ User module
 """
-import hashlib
 from models.base import Base
+from models.password import hash_password, verify_password, needs_rehash
+import logging
 
 
 class User(Base):
     """ User class
     """
 
+    __slots__ = ('email', '_password', 'first_name', 'last_name')
+    INDEXES = {'email': True}
+
     def __init__(self, *args: list, **kwargs: dict):
         """ Initialize a User instance
         """
@@ -26,22 +30,32 @@ class User(Base):
 
     @password.setter
     def password(self, pwd: str):
-        """ Setter of a new password: encrypt in SHA256
+        """ Setter of a new password: hash it with the configured scheme
         """
         if pwd is None or type(pwd) is not str:
             self._password = None
         else:
-            self._password = hashlib.sha256(pwd.encode()).hexdigest().lower()
+            self._password = hash_password(pwd)
 
     def is_valid_password(self, pwd: str) -> bool:
         """ Validate a password
         """
         if pwd is None or type(pwd) is not str:
             return False
-        if self.password is None:
+        if not verify_password(pwd, self.password):
             return False
-        pwd_e = pwd.encode()
-        return hashlib.sha256(pwd_e).hexdigest().lower() == self.password
+        if needs_rehash(self.password):
+            # upgrade the stored hash while the clear password is known;
+            # the password is valid even if that fails
+            hashed = self.password
+            try:
+                self.password = pwd
+                if User.get(self.id) is not None:
+                    self.save()
+            except Exception:
+                self._password = hashed
+                logging.exception("Password rehash failed for %s", self.id)
+        return True
 
     def display_name(self) -> str:
         """ Display User name based on email/first_name/last_name
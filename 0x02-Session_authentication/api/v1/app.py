@@ -4,10 +4,15 @@
 from os import getenv
 
 from flask_cors import (CORS, cross_origin)
-from flask import Flask, jsonify, abort, request
+from flask import Flask, jsonify, abort, request, g
 from api.v1.views import app_views
+from api.v1.auth.path_matcher import PathMatcher
+from models.base import reset_lookups
 
 
+# expose the lookup count of each request to clients, for debugging only
+API_DEBUG_LOOKUPS = getenv('API_DEBUG_LOOKUPS', '0') == '1'
+
 app = Flask(__name__)
 app.register_blueprint(app_views)
 CORS(app, resources={r"/api/v1/*": {"origins": "*"}})
@@ -29,6 +34,15 @@ elif getenv('AUTH_TYPE') == 'session_exp_auth':
 elif getenv('AUTH_TYPE') == 'session_db_auth':
     from api.v1.auth.session_db_auth import SessionDBAuth
     auth = SessionDBAuth()
+elif getenv('AUTH_TYPE') == 'session_token_auth':
+    from api.v1.auth.session_token_auth import SessionTokenAuth
+    auth = SessionTokenAuth()
+
+EXCLUDED_PATHS = PathMatcher([
+    '/api/v1/status/',
+    '/api/v1/unauthorized/',
+    '/api/v1/forbidden/',
+    '/api/v1/auth_session/login/'])
 
 
 @app.errorhandler(401)
@@ -52,24 +66,27 @@ def not_found(error) -> str:
 @app.before_request
 def before_request() -> None:
     """request before"""
-    request_path_list = [
-        '/api/v1/status/',
-        '/api/v1/unauthorized/',
-        '/api/v1/forbidden/',
-        '/api/v1/auth_session/login/']
-
+    reset_lookups()
     if auth:
-        if auth.require_auth(request.path, request_path_list):
+        if auth.require_auth(request.path, EXCLUDED_PATHS):
             if auth.authorization_header(
                     request) is None and auth.session_cookie(request) is None:
                 abort(401)
-            request.current_user = auth.current_user(request)
+            g.current_user = auth.request_user(request)
 
-            if auth.current_user(request) is None:
+            if g.current_user is None:
                 abort(403)
 
-            if request.current_user is None:
-                abort(403)
+
+@app.after_request
+def after_request(response):
+    """count the storage lookups made by the request"""
+    g.store_lookups = reset_lookups()
+    app.logger.debug("%s %s: %d storage lookups", request.method,
+                     request.path, g.store_lookups)
+    if API_DEBUG_LOOKUPS:
+        response.headers['X-Store-Lookups'] = str(g.store_lookups)
+    return response
 
 
 if __name__ == "__main__":
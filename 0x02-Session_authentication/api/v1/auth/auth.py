@@ -5,31 +5,20 @@
 from flask import request
 from typing import List, TypeVar
 from os import getenv
+from api.v1.auth.path_matcher import PathMatcher, path_matcher
 
 
 class Auth():
     """ main class codebase"""
 
     def require_auth(self, path: str, excluded_paths: List[str]) -> bool:
-        """ requirements"""
+        """ requirements: excluded_paths is a PathMatcher, or a list
+        compiled into one the first time it is seen"""
         if path is None or excluded_paths is None or not len(excluded_paths):
             return True
-        
-        if path[-1] != '/':
-            path += '/'
-        if excluded_paths[-1] != '/':
-            excluded_paths += '/'
-
-        astericks = [stars[:-1]
-                     for stars in excluded_paths if stars[-1] == '*']
-
-        for stars in astericks:
-            if path.startswith(stars):
-                return False
-
-        if path in excluded_paths:
-            return False
-        return True
+        if not isinstance(excluded_paths, PathMatcher):
+            excluded_paths = path_matcher(tuple(excluded_paths))
+        return not excluded_paths.match(path)
 
     def authorization_header(self, request=None) -> str:
         """ sends to header"""
@@ -41,6 +30,16 @@ class Auth():
         """ gets current user"""
         return None
 
+    def request_user(self, request=None) -> TypeVar('User'):
+        """ current_user resolved once per request, kept on the request"""
+        if request is None:
+            return None
+        try:
+            return request.current_user
+        except AttributeError:
+            request.current_user = self.current_user(request)
+            return request.current_user
+
     def session_cookie(self, request=None):
         """ cookie codebase"""
         if request is None:
@@ -4,11 +4,79 @@
 Authenticates user information
 """
 
-from typing import TypeVar, Tuple
+from collections import OrderedDict
+from typing import TypeVar, Tuple, Optional
 from base64 import b64decode, decode
+from os import getenv
 from api.v1.auth.auth import Auth
 from models.user import User
 import base64
+import hashlib
+import hmac
+import os
+import threading
+import time
+
+
+BASIC_AUTH_CACHE_TTL = float(getenv('BASIC_AUTH_CACHE_TTL', '60'))
+BASIC_AUTH_CACHE_SIZE = int(getenv('BASIC_AUTH_CACHE_SIZE', '1024'))
+
+
+class CredentialCache():
+    """
+    LRU cache of verified Authorization headers, each mapped to the
+    user id and password hash it was verified against. Headers are
+    keyed by an HMAC with a per-process secret, so the cache never
+    holds credentials. An entry is dropped when it expires, or when
+    its user was removed or changed password
+    """
+
+    def __init__(self, ttl: float = BASIC_AUTH_CACHE_TTL,
+                 size: int = BASIC_AUTH_CACHE_SIZE):
+        """ Initialize an empty cache
+        """
+        self.ttl = ttl
+        self.size = size
+        self._secret = os.urandom(32)
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _key(self, auth_header: str) -> bytes:
+        """ Keyed digest of the header
+        """
+        return hmac.new(self._secret, auth_header.encode('utf-8'),
+                        hashlib.sha256).digest()
+
+    def get(self, auth_header: str) -> Optional[TypeVar('User')]:
+        """ The user auth_header was verified for, if still valid
+        """
+        key = self._key(auth_header)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            user_id, password, expires = entry
+            if expires < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+        user = User.get(user_id)
+        if user is None or user.password != password:
+            with self._lock:
+                self._entries.pop(key, None)
+            return None
+        return user
+
+    def put(self, auth_header: str, user: TypeVar('User')):
+        """ Remember that auth_header authenticates user
+        """
+        key = self._key(auth_header)
+        entry = (user.id, user.password, time.monotonic() + self.ttl)
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.size:
+                self._entries.popitem(last=False)
 
 
 class BasicAuth(Auth):
@@ -16,6 +84,12 @@ class BasicAuth(Auth):
     Extends Auth class
     """
 
+    def __init__(self):
+        """ Initialize the credential cache (disabled by a zero TTL)
+        """
+        self.cache = CredentialCache() if BASIC_AUTH_CACHE_TTL > 0 \
+            else None
+
     def extract_base64_authorization_header(self, auth_header: str) -> str:
         """Returns the decoded value of a Base64 string
         """
@@ -74,6 +148,10 @@ class BasicAuth(Auth):
 
         if not auth_header:
             return None
+        if self.cache is not None:
+            user = self.cache.get(auth_header)
+            if user is not None:
+                return user
 
         extract_base64 = self.extract_base64_authorization_header(auth_header)
         decode_base64 = self.decode_base64_authorization_header(extract_base64)
@@ -84,4 +162,6 @@ class BasicAuth(Auth):
         user_credentials = self.user_object_from_credentials(
             user_email, user_password)
 
+        if user_credentials is not None and self.cache is not None:
+            self.cache.put(auth_header, user_credentials)
         return user_credentials
@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+"""Matcher of the paths excluded from authentication"""
+
+from functools import lru_cache
+from typing import Iterable, Tuple
+import re
+
+
+class PathMatcher():
+    """ Excluded paths compiled once: exact entries in a set, entries
+    ending with '*' in one regex of their prefixes. Trailing slashes
+    are normalized so '/api/v1/status' and '/api/v1/status/' match
+    """
+
+    def __init__(self, excluded_paths: Iterable[str]):
+        """ compile excluded_paths"""
+        self.exact = set()
+        prefixes = []
+        for excluded in excluded_paths:
+            if excluded.endswith('*'):
+                prefixes.append(excluded[:-1])
+            else:
+                self.exact.add(self.normalize(excluded))
+        self.prefixes = None
+        if prefixes:
+            # longest first, though any match is enough
+            prefixes.sort(key=len, reverse=True)
+            self.prefixes = re.compile(
+                '|'.join(re.escape(prefix) for prefix in prefixes))
+
+    @staticmethod
+    def normalize(path: str) -> str:
+        """ path with a trailing slash"""
+        return path if path.endswith('/') else path + '/'
+
+    def __len__(self) -> int:
+        """ number of compiled entries"""
+        return len(self.exact) + (self.prefixes is not None)
+
+    def match(self, path: str) -> bool:
+        """ whether path is excluded"""
+        path = self.normalize(path)
+        if path in self.exact:
+            return True
+        return self.prefixes is not None and \
+            self.prefixes.match(path) is not None
+
+
+@lru_cache(maxsize=32)
+def path_matcher(excluded_paths: Tuple[str, ...]) -> PathMatcher:
+    """ matcher of excluded_paths, compiled once per list"""
+    return PathMatcher(excluded_paths)
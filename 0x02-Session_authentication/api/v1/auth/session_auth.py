@@ -3,7 +3,7 @@
 
 from flask.globals import session
 from api.v1.auth.auth import Auth
-from typing import Dict
+from api.v1.auth.session_store import SessionStore
 from models.user import User
 import uuid
 
@@ -11,14 +11,14 @@ import uuid
 class SessionAuth(Auth):
     """ inherites session from Auth"""
 
-    user_id_by_session_id: Dict[str, str] = {}
+    user_id_by_session_id: SessionStore = SessionStore()
 
     def create_session(self, user_id: str = None) -> str:
         """ create session ID"""
         if user_id is None or not isinstance(user_id, str):
             return None
         session_id = str(uuid.uuid4())
-        self.user_id_by_session_id[session_id] = user_id
+        self.user_id_by_session_id.create(session_id, user_id)
         return session_id
 
     def current_user(self, request=None):
@@ -31,7 +31,7 @@ class SessionAuth(Auth):
         """ user Session ID"""
         if session_id is None or not isinstance(session_id, str):
             return None
-        return self.user_id_by_session_id.get(session_id, None)
+        return self.user_id_by_session_id.get(session_id)
 
     def destroy_session(self, request=None):
         """ destroy or delete"""
@@ -42,5 +42,4 @@ class SessionAuth(Auth):
         if not self.user_id_for_session_id(cookie_data):
             return False
 
-        del self.user_id_by_session_id[cookie_data]
-        return True
+        return self.user_id_by_session_id.delete(cookie_data)
@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+"""Session authentication persisted as UserSession objects"""
+
+from datetime import datetime, timedelta
+from os import getenv
+from api.v1.auth.session_exp_auth import SessionExpAuth
+from models.user_session import UserSession
+import atexit
+import logging
+import queue
+import threading
+import time
+
+
+# seconds between two removals of the expired sessions from the storage,
+# never if <= 0
+SESSION_PURGE_EVERY = int(getenv('SESSION_PURGE_EVERY', '3600'))
+
+
+class SessionDBAuth(SessionExpAuth):
+    """ sessions kept in the storage so they survive restarts
+
+    The inherited in-memory store caches the hot sessions. Creations and
+    destructions are queued and written behind by one thread, in batches
+    grouped by UserSession.bulk(), so a login doesn't wait for a write.
+    Expired sessions are removed when looked up, and purged by the same
+    thread every SESSION_PURGE_EVERY seconds
+    """
+
+    def __init__(self):
+        """init class: load the sessions and start the writer"""
+        super().__init__()
+        UserSession.load_from_file()
+        self._writes = queue.Queue()
+        # session ids destroyed but maybe not removed from the storage yet
+        self._destroyed = set()
+        self._destroyed_lock = threading.Lock()
+        self._writer = threading.Thread(target=self._write_forever,
+                                        name='session-writer', daemon=True)
+        self._writer.start()
+        atexit.register(self.flush)
+
+    def create_session(self, user_id=None):
+        """ create a session, persisted behind the request"""
+        session_id = super().create_session(user_id)
+        if session_id is None:
+            return None
+        self._writes.put(('save', UserSession(user_id=user_id,
+                                              session_id=session_id)))
+        return session_id
+
+    def user_id_for_session_id(self, session_id=None):
+        """ user id of a live session, from the cache or the storage"""
+        if session_id is None or not isinstance(session_id, str):
+            return None
+        user_id = super().user_id_for_session_id(session_id)
+        if user_id is not None:
+            return user_id
+        with self._destroyed_lock:
+            if session_id in self._destroyed:
+                return None
+
+        sessions = UserSession.search({'session_id': session_id})
+        if not sessions:
+            return None
+        session = sessions[0]
+        expires_in = 0
+        if self.session_duration > 0:
+            age = datetime.utcnow() - session.created_at
+            expires_in = self.session_duration - age.total_seconds()
+            if expires_in <= 0:
+                with self._destroyed_lock:
+                    self._destroyed.add(session_id)
+                self._writes.put(('remove', session_id))
+                return None
+        self.user_id_by_session_id.create(session_id, session.user_id,
+                                          expires_in)
+        return session.user_id
+
+    def destroy_session(self, request=None):
+        """ destroy a session, removed from the storage behind the
+        request"""
+        session_id = self.session_cookie(request)
+        if session_id is None:
+            return False
+        if not self.user_id_for_session_id(session_id):
+            return False
+        self.user_id_by_session_id.delete(session_id)
+        with self._destroyed_lock:
+            self._destroyed.add(session_id)
+        self._writes.put(('remove', session_id))
+        return True
+
+    def _write_forever(self):
+        """ apply the queued writes, a batch per storage transaction,
+        and purge the expired sessions when due"""
+        purging = SESSION_PURGE_EVERY > 0 and self.session_duration > 0
+        purge_at = time.monotonic() + SESSION_PURGE_EVERY
+        while True:
+            try:
+                batch = [self._writes.get(
+                    timeout=max(purge_at - time.monotonic(), 0)
+                    if purging else None)]
+            except queue.Empty:
+                batch = []
+            while True:
+                try:
+                    batch.append(self._writes.get_nowait())
+                except queue.Empty:
+                    break
+            purge = purging and time.monotonic() >= purge_at
+            if purge:
+                purge_at = time.monotonic() + SESSION_PURGE_EVERY
+            try:
+                with UserSession.bulk():
+                    for op, arg in batch:
+                        if op == 'save':
+                            arg.save()
+                        else:
+                            self._remove(arg)
+                    if purge:
+                        self._purge()
+            except Exception:
+                logging.exception("Session writes lost")
+            finally:
+                for _ in batch:
+                    self._writes.task_done()
+
+    def _remove(self, session_id: str):
+        """ remove the UserSession of session_id from the storage"""
+        for session in UserSession.search({'session_id': session_id}):
+            session.remove()
+        with self._destroyed_lock:
+            self._destroyed.discard(session_id)
+
+    def _purge(self):
+        """ remove the expired sessions from the storage"""
+        if self.session_duration <= 0:
+            return
+        expired = datetime.utcnow() - timedelta(seconds=self.session_duration)
+        for session in UserSession.query({'created_at__lt': expired}):
+            session.remove()
+
+    def flush(self):
+        """ wait until every queued write is in the storage"""
+        self._writes.join()
@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""In-memory session store: sessions are spread over lock-striped shards
+and expired ones are evicted as time passes, not only when looked up"""
+
+from os import getenv
+from typing import Dict, Optional
+import heapq
+import threading
+import time
+import weakref
+
+
+# longest time (seconds) an expired session stays in memory: stores with a
+# duration sweep every min(duration, SESSION_SWEEP_EVERY) seconds
+SESSION_SWEEP_EVERY = float(getenv('SESSION_SWEEP_EVERY', '60'))
+
+
+class SessionRecord():
+    """ compact record of one session"""
+
+    __slots__ = ('user_id', 'expires_at')
+
+    def __init__(self, user_id: str, expires_at: float):
+        """ session of user_id, valid until expires_at (monotonic seconds,
+        0 for never)"""
+        self.user_id = user_id
+        self.expires_at = expires_at
+
+
+class Shard():
+    """ sessions hashed to one lock, with a min-heap of their expiries"""
+
+    __slots__ = ('lock', 'sessions', 'expiries', 'created', 'evictions')
+
+    def __init__(self):
+        """ empty shard"""
+        self.lock = threading.Lock()
+        self.sessions: Dict[str, SessionRecord] = {}
+        self.expiries = []
+        self.created = 0
+        self.evictions = 0
+
+
+class SessionStore():
+    """ session id -> user id, each session expiring duration seconds
+    after its creation (never if duration <= 0)
+
+    Every write sweeps the expired sessions off its shard's heap, and
+    sweep() does it for all shards, run by a background thread when the
+    store has a duration, so memory follows live sessions even on idle
+    shards
+    """
+
+    def __init__(self, duration: int = 0, shards: int = 16):
+        """ empty store of shards lock-striped shards"""
+        self.duration = duration
+        self._shards = [Shard() for _ in range(shards)]
+        self.sweeps = 0
+        self.sweep_interval = min(duration, SESSION_SWEEP_EVERY)
+        if self.sweep_interval > 0:
+            threading.Thread(target=_sweep_forever,
+                             args=(weakref.ref(self), self.sweep_interval),
+                             name='session-sweeper', daemon=True).start()
+
+    def _shard(self, session_id: str) -> Shard:
+        """ shard holding session_id"""
+        return self._shards[hash(session_id) % len(self._shards)]
+
+    def _sweep(self, shard: Shard, now: float):
+        """ evict the expired sessions of shard, its lock held"""
+        expiries = shard.expiries
+        while expiries and expiries[0][0] <= now:
+            expires_at, session_id = heapq.heappop(expiries)
+            record = shard.sessions.get(session_id)
+            # the session may be gone or recreated since it was pushed
+            if record is not None and record.expires_at == expires_at:
+                del shard.sessions[session_id]
+                shard.evictions += 1
+
+    def create(self, session_id: str, user_id: str,
+               expires_in: float = None):
+        """ store a new session of user_id, expiring in the store's
+        duration unless expires_in (seconds) is given"""
+        now = time.monotonic()
+        if expires_in is None:
+            expires_in = self.duration
+        expires_at = now + expires_in if expires_in > 0 else 0
+        shard = self._shard(session_id)
+        with shard.lock:
+            self._sweep(shard, now)
+            shard.sessions[session_id] = SessionRecord(user_id, expires_at)
+            if expires_at:
+                heapq.heappush(shard.expiries, (expires_at, session_id))
+            shard.created += 1
+
+    def get(self, session_id: str) -> Optional[str]:
+        """ user id of a live session, None otherwise"""
+        record = self._shard(session_id).sessions.get(session_id)
+        if record is None:
+            return None
+        if record.expires_at and record.expires_at < time.monotonic():
+            return None
+        return record.user_id
+
+    def delete(self, session_id: str) -> bool:
+        """ drop a session, False if there was none"""
+        shard = self._shard(session_id)
+        with shard.lock:
+            self._sweep(shard, time.monotonic())
+            return shard.sessions.pop(session_id, None) is not None
+
+    def sweep(self):
+        """ evict the expired sessions of every shard"""
+        now = time.monotonic()
+        for shard in self._shards:
+            with shard.lock:
+                self._sweep(shard, now)
+        self.sweeps += 1
+
+    def __contains__(self, session_id: str) -> bool:
+        """ whether session_id is a live session"""
+        return self.get(session_id) is not None
+
+    def __len__(self) -> int:
+        """ number of stored sessions, expired ones not yet swept
+        included"""
+        return sum(len(shard.sessions) for shard in self._shards)
+
+    def metrics(self) -> dict:
+        """ size and counters of the store"""
+        return {'size': len(self),
+                'created': sum(shard.created for shard in self._shards),
+                'evictions': sum(shard.evictions for shard in self._shards),
+                'sweeps': self.sweeps,
+                'sweep_interval': self.sweep_interval,
+                'shards': len(self._shards)}
+
+
+def _sweep_forever(store_ref: weakref.ref, interval: float):
+    """ sweep the store every interval seconds, until it is collected"""
+    while True:
+        time.sleep(interval)
+        store = store_ref()
+        if store is None:
+            return
+        store.sweep()
+        del store
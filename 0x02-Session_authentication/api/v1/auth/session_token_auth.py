@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+"""Stateless session authentication: the session cookie is a signed token
+holding the user id and its expiry, so no session is stored server side"""
+
+from collections import OrderedDict
+from os import getenv
+from typing import Dict, Optional, Tuple
+from api.v1.auth.session_auth import SessionAuth
+import base64
+import hashlib
+import hmac
+import json
+import threading
+import time
+
+
+# 'key_id:secret' pairs separated by commas: the first signs new tokens,
+# all of them verify, so a new key can be rolled out before the old one
+# is dropped. Required: every worker must share the keys
+SESSION_SIGNING_KEYS = getenv('SESSION_SIGNING_KEYS', '')
+# longest lifetime of a token (seconds), SESSION_DURATION being capped to it
+SESSION_MAX_AGE = int(getenv('SESSION_MAX_AGE', '86400'))
+# tokens kept revoked at most (destroyed before they expire)
+SESSION_REVOKED_MAX = int(getenv('SESSION_REVOKED_MAX', '10000'))
+
+
+def _b64encode(data: bytes) -> str:
+    """ unpadded URL-safe base64"""
+    return base64.urlsafe_b64encode(data).rstrip(b'=').decode('ascii')
+
+
+def _b64decode(data: str) -> bytes:
+    """ inverse of _b64encode"""
+    return base64.urlsafe_b64decode(data + '=' * (-len(data) % 4))
+
+
+def parse_keys(keys: str) -> Tuple[str, Dict[str, bytes]]:
+    """ (signing key id, key id -> secret) of SESSION_SIGNING_KEYS"""
+    secrets = OrderedDict()
+    for pair in keys.split(','):
+        key_id, sep, secret = pair.strip().partition(':')
+        if sep and key_id and secret:
+            secrets[key_id] = secret.encode('utf-8')
+    if not secrets:
+        raise ValueError("SESSION_SIGNING_KEYS holds no 'key_id:secret'")
+    return next(iter(secrets)), dict(secrets)
+
+
+class SessionTokenAuth(SessionAuth):
+    """ sessions as 'payload.signature' tokens, the payload being the
+    base64 JSON of the user id, issue and expiry times and signing key
+    id, signed by HMAC-SHA256. Every token expires, at most
+    SESSION_MAX_AGE seconds after its issue.
+
+    Destroyed sessions are kept in a bounded revocation list until they
+    expire. The list is local to the process: another worker, or this one
+    after a restart or once SESSION_REVOKED_MAX is reached, accepts a
+    destroyed token until its expiry, which bounds that window
+    """
+
+    def __init__(self):
+        """init class"""
+        try:
+            session_duration = int(getenv('SESSION_DURATION'))
+        except Exception:
+            session_duration = 0
+        if session_duration <= 0 or session_duration > SESSION_MAX_AGE:
+            session_duration = SESSION_MAX_AGE
+        self.session_duration = session_duration
+        self.signing_key_id, self.keys = parse_keys(SESSION_SIGNING_KEYS)
+        # no server side session
+        self.user_id_by_session_id = None
+        # signature -> expiry of the revoked tokens
+        self.revoked = OrderedDict()
+        self._revoked_lock = threading.Lock()
+
+    def _sign(self, key_id: str, payload: str) -> str:
+        """ signature of payload with the key key_id"""
+        return _b64encode(hmac.new(self.keys[key_id], payload.encode(),
+                                   hashlib.sha256).digest())
+
+    def create_session(self, user_id: str = None) -> str:
+        """ signed token of a new session of user_id"""
+        if user_id is None or not isinstance(user_id, str):
+            return None
+        now = int(time.time())
+        claims = {'uid': user_id, 'iat': now,
+                  'exp': now + self.session_duration,
+                  'kid': self.signing_key_id}
+        payload = _b64encode(json.dumps(claims, separators=(',', ':'))
+                             .encode('utf-8'))
+        return payload + '.' + self._sign(self.signing_key_id, payload)
+
+    def _claims(self, token: str) -> Optional[dict]:
+        """ claims of a genuine, unexpired and unrevoked token"""
+        if token is None or not isinstance(token, str):
+            return None
+        payload, sep, signature = token.partition('.')
+        if not sep:
+            return None
+        try:
+            claims = json.loads(_b64decode(payload))
+            key_id = claims['kid']
+        except Exception:
+            return None
+        if key_id not in self.keys or not hmac.compare_digest(
+                self._sign(key_id, payload).encode(),
+                signature.encode('utf-8', 'replace')):
+            return None
+        # tokens issued without an expiry, or outliving SESSION_MAX_AGE
+        # (lowered since), never pass
+        expires = claims.get('exp')
+        if not isinstance(expires, int) or expires < time.time() or \
+                expires - claims.get('iat', 0) > SESSION_MAX_AGE:
+            return None
+        if signature in self.revoked:
+            return None
+        return claims
+
+    def user_id_for_session_id(self, session_id: str = None) -> str:
+        """ user id of a valid token, without any lookup"""
+        claims = self._claims(session_id)
+        if claims is None:
+            return None
+        return claims.get('uid')
+
+    def destroy_session(self, request=None):
+        """ revoke the token of the request until it expires"""
+        token = self.session_cookie(request)
+        claims = self._claims(token)
+        if claims is None:
+            return False
+        now = time.time()
+        with self._revoked_lock:
+            self.revoked[token.partition('.')[2]] = claims['exp']
+            # oldest revocations first: drop those expired since
+            while self.revoked:
+                expires = next(iter(self.revoked.values()))
+                if expires >= now:
+                    break
+                self.revoked.popitem(last=False)
+            while len(self.revoked) > SESSION_REVOKED_MAX:
+                self.revoked.popitem(last=False)
+        return True
@@ -21,8 +21,12 @@ def stats() -> str:
       - the number of each objects
     """
     from models.user import User
+    from api.v1.app import auth
     stats = {}
     stats['users'] = User.count()
+    sessions = getattr(auth, 'user_id_by_session_id', None)
+    if hasattr(sessions, 'metrics'):
+        stats['sessions'] = sessions.metrics()
     return jsonify(stats)
 
 
@@ -3,12 +3,42 @@
 from api.v1.views import app_views
 from flask import abort, jsonify, request
 from models.user import User
+from os import getenv
+
+# users listed when no limit is given, and the largest limit accepted
+USERS_PAGE_SIZE = int(getenv('USERS_PAGE_SIZE', '100'))
+USERS_MAX_LIMIT = int(getenv('USERS_MAX_LIMIT', '1000'))
+# attributes of the User JSON the list can be ordered by
+SORTABLE_FIELDS = ('id', 'email', 'first_name', 'last_name',
+                   'created_at', 'updated_at')
 
 
 @app_views.route('/users', methods=['GET'], strict_slashes=False)
 def view_all_users() -> str:
-    """ list of all User objects"""
-    all_users = [user.to_json() for user in User.all()]
+    """ list of the User objects, paginated with the optional
+    limit (USERS_PAGE_SIZE, 100, by default and at most USERS_MAX_LIMIT,
+    1000), offset and order_by ('-attr' for descending) query
+    parameters"""
+    page = {}
+    try:
+        if request.args.get('limit') is not None:
+            page['limit'] = int(request.args.get('limit'))
+        if request.args.get('offset') is not None:
+            page['offset'] = int(request.args.get('offset'))
+    except ValueError:
+        return jsonify({'error': "Wrong format"}), 400
+    if page.get('limit', 0) < 0 or page.get('offset', 0) < 0:
+        return jsonify({'error': "Wrong format"}), 400
+    page['limit'] = min(page.get('limit', USERS_PAGE_SIZE), USERS_MAX_LIMIT)
+    order_by = request.args.get('order_by')
+    if order_by is not None and order_by[order_by.startswith('-'):] \
+            not in SORTABLE_FIELDS:
+        return jsonify({'error': "Wrong format"}), 400
+    try:
+        users = User.query(order_by=order_by, **page)
+    except (TypeError, ValueError):
+        return jsonify({'error': "Wrong format"}), 400
+    all_users = [user.to_json() for user in users]
     return jsonify(all_users)
 
 
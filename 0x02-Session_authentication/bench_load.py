@@ -0,0 +1,48 @@
+#!/usr/bin/env python3
+""" Benchmark of User.load_from_file() startup time, lazy vs eager
+"""
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+import models.engine.file_storage as file_storage
+from models.engine import storage
+from models.user import User
+
+
+def bench(lazy: bool) -> str:
+    """ Load .db_User.json from the current directory and describe it
+    """
+    file_storage.STORE_LAZY_LOAD = lazy
+    storage.data.clear()
+    storage.indexes.clear()
+    storage.indexed_values.clear()
+    tracemalloc.start()
+    User.load_from_file()
+    held, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    User.load_from_file()
+    start = time.perf_counter()
+    User.search({'email': "user42@hbtn.io"})
+    lookup = time.perf_counter() - start
+    return "load {:.3f}s, held {:.1f} MB (peak {:.1f}), first lookup " \
+        "{:.3f} ms".format(storage.load_stats['User']['seconds'],
+                           held / 2 ** 20, peak / 2 ** 20, lookup * 1000)
+
+
+if __name__ == "__main__":
+    users = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    with tempfile.TemporaryDirectory() as tmp:
+        os.chdir(tmp)
+        with open(".db_User.json", 'w') as f:
+            json.dump({str(i): User(id=str(i),
+                                    email="user{}@hbtn.io".format(i),
+                                    _password="{:064x}".format(i),
+                                    first_name="First{}".format(i),
+                                    last_name="Last{}".format(i))
+                       .to_json(True) for i in range(users)}, f)
+        print("{} users".format(users))
+        print("eager: {}".format(bench(False)))
+        print("lazy:  {}".format(bench(True)))
@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+""" Benchmark of the memory held per User, slotted vs dict based, and
+per record loaded but not built yet
+"""
+import sys
+import tracemalloc
+from types import SimpleNamespace
+from models.engine.file_storage import LazyObjects
+from models.user import User
+
+LAZY = LazyObjects(User)
+
+
+def measure(build, count: int) -> float:
+    """ Return the bytes allocated per object built by build(i)
+    """
+    tracemalloc.start()
+    before, _ = tracemalloc.get_traced_memory()
+    objs = [build(i) for i in range(count)]
+    after, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return (after - before) / len(objs)
+
+
+def record(i: int) -> dict:
+    """ JSON record of the i-th user as stored in .db_User.json
+    """
+    return {'id': "{:036d}".format(i),
+            'created_at': "2024-01-01T00:00:00",
+            'updated_at': "2024-01-01T00:00:00",
+            'email': "user{}@hbtn.io".format(i),
+            '_password': "{:064x}".format(i),
+            'first_name': None, 'last_name': None}
+
+
+def as_namespace(i: int) -> SimpleNamespace:
+    """ The previous, __dict__ based, layout of a User
+    """
+    user = User(**record(i))
+    return SimpleNamespace(**dict(user._attributes()))
+
+
+def packed(i: int) -> bytes:
+    """ The i-th user as LazyObjects keeps it until first accessed
+    """
+    LAZY['user'] = record(i)
+    return LAZY._items['user']
+
+
+if __name__ == "__main__":
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    print("raw JSON records: {:6.0f} bytes/user".format(
+        measure(record, count)))
+    print("unbuilt records:  {:6.0f} bytes/user".format(
+        measure(packed, count)))
+    print("__dict__ layout:  {:6.0f} bytes/user".format(
+        measure(as_namespace, count)))
+    print("__slots__ layout: {:6.0f} bytes/user".format(
+        measure(lambda i: User(**record(i)), count)))
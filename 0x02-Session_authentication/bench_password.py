@@ -0,0 +1,37 @@
+#!/usr/bin/env python3
+""" Benchmark of password hashing and verification per scheme and bcrypt
+cost factor, to pick BCRYPT_ROUNDS within the login latency budget
+"""
+import sys
+import time
+from models import password
+
+
+def bench(hasher, logins: int) -> tuple:
+    """ Return the mean hash and verify latencies in ms
+    """
+    start = time.perf_counter()
+    for _ in range(logins):
+        hashed = hasher.hash("MyAmazingPassw0rd")
+    hashing = time.perf_counter() - start
+    start = time.perf_counter()
+    for _ in range(logins):
+        hasher.verify("MyAmazingPassw0rd", hashed)
+    verifying = time.perf_counter() - start
+    return hashing / logins * 1000, verifying / logins * 1000
+
+
+if __name__ == "__main__":
+    logins = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+    hashers = [password.Sha256Hasher()]
+    if password.bcrypt is None:
+        print("bcrypt is not installed: only sha256 is measured")
+    else:
+        hashers += [password.BcryptHasher(rounds)
+                    for rounds in range(10, 15)]
+    for hasher in hashers:
+        name = hasher.name
+        if hasattr(hasher, 'rounds'):
+            name += " rounds={}".format(hasher.rounds)
+        print("{:<18} hash {:9.3f} ms  verify {:9.3f} ms"
+              .format(name, *bench(hasher, logins)))
@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+""" Micro-benchmark of the excluded paths check of Auth.require_auth:
+the former per-request list scan against the compiled PathMatcher
+"""
+import sys
+import timeit
+from api.v1.auth.path_matcher import PathMatcher
+
+
+def legacy_require_auth(path: str, excluded_paths: list) -> bool:
+    """ require_auth as it was, rebuilding the wildcards on each call
+    """
+    if path is None or excluded_paths is None or not len(excluded_paths):
+        return True
+    if path[-1] != '/':
+        path += '/'
+    astericks = [stars[:-1] for stars in excluded_paths if stars[-1] == '*']
+    for stars in astericks:
+        if path.startswith(stars):
+            return False
+    if path in excluded_paths:
+        return False
+    return True
+
+
+def excluded_paths(count: int) -> list:
+    """ count excluded paths, one in 4 being a '*' prefix
+    """
+    return ['/api/v1/public{}/{}'.format(i, '*' if i % 4 == 0 else '')
+            for i in range(count)]
+
+
+if __name__ == "__main__":
+    calls = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    paths = ['/api/v1/users/me', '/api/v1/public1/', '/api/v1/public8/x']
+    for count in (10, 100, 500, 1000):
+        excluded = excluded_paths(count)
+        matcher = PathMatcher(excluded)
+        for path in paths:
+            assert legacy_require_auth(path, excluded) == \
+                (not matcher.match(path))
+        legacy = timeit.timeit(
+            lambda: [legacy_require_auth(p, excluded) for p in paths],
+            number=calls // len(paths))
+        compiled = timeit.timeit(
+            lambda: [matcher.match(p) for p in paths],
+            number=calls // len(paths))
+        print("{:5} paths  legacy {:8.2f} us  compiled {:6.2f} us  ({:.0f}x)"
+              .format(count, legacy / calls * 1e6, compiled / calls * 1e6,
+                      legacy / compiled))
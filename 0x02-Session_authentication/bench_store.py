@@ -0,0 +1,49 @@
+#!/usr/bin/env python3
+""" Benchmark of User.save() latency per storage mode and fsync policy
+"""
+import os
+import sys
+import tempfile
+import time
+import models.engine.file_storage as file_storage
+from models.engine import storage
+from models.user import User
+
+
+def bench(mode: str, fsync: str, users: int) -> float:
+    """ Return the mean save() latency in ms once `users` users exist
+    """
+    file_storage.STORE_MODE = mode
+    file_storage.STORE_FSYNC = fsync
+    file_storage.LAST_FSYNC.clear()
+    with tempfile.TemporaryDirectory() as tmp:
+        cwd = os.getcwd()
+        os.chdir(tmp)
+        try:
+            User.load_from_file()
+            with User.bulk():
+                for i in range(users):
+                    user = User(email="user{}@hbtn.io".format(i))
+                    user.save()
+            start = time.perf_counter()
+            for i in range(100):
+                user = User(email="new{}@hbtn.io".format(i))
+                user.save()
+            elapsed = time.perf_counter() - start
+            User.flush()
+            # compaction threads use relative paths: let them finish
+            # before leaving the directory
+            while storage.compacting:
+                time.sleep(0.01)
+        finally:
+            os.chdir(cwd)
+    return elapsed / 100 * 1000
+
+
+if __name__ == "__main__":
+    users = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    print("{} existing users".format(users))
+    for mode in ('snapshot', 'journal'):
+        for fsync in ('never', 'interval', 'always'):
+            print("{:>8} fsync={:<8} {:8.3f} ms/save"
+                  .format(mode, fsync, bench(mode, fsync, users)))
@@ -2,27 +2,49 @@
 """ Base module
 """
 from datetime import datetime
-from typing import TypeVar, List, Iterable
-from os import path
-import json
+from typing import TypeVar, List, Iterable, Iterator, Tuple, Dict
+from models.engine import storage
+import threading
 import uuid
 
 
 TIMESTAMP_FORMAT = "%Y-%m-%dT%H:%M:%S"
-DATA = {}
+# class -> attribute names declared in the __slots__ of its MRO
+SLOT_NAMES = {}
+# lookups made in the storage by the current thread
+LOOKUPS = threading.local()
+
+
+def count_lookup():
+    """ Count one storage lookup of the current thread
+    """
+    LOOKUPS.count = getattr(LOOKUPS, 'count', 0) + 1
+
+
+def reset_lookups() -> int:
+    """ Return the lookups counted by the current thread, then reset it
+    """
+    count = getattr(LOOKUPS, 'count', 0)
+    LOOKUPS.count = 0
+    return count
 
 
 class Base():
     """ Base class
+
+    Attributes set by the models are declared in __slots__ so that an
+    instance doesn't carry a dictionary: __dict__ is only allocated the
+    first time an undeclared attribute is set on it
     """
 
+    __slots__ = ('id', 'created_at', 'updated_at', '__dict__')
+
+    # attribute name -> unique, indexed by the storage
+    INDEXES: Dict[str, bool] = {}
+
     def __init__(self, *args: list, **kwargs: dict):
         """ Initialize a Base instance
         """
-        s_class = str(self.__class__.__name__)
-        if DATA.get(s_class) is None:
-            DATA[s_class] = {}
-
         self.id = kwargs.get('id', str(uuid.uuid4()))
         if kwargs.get('created_at') is not None:
             self.created_at = datetime.strptime(kwargs.get('created_at'),
@@ -35,6 +57,14 @@ class Base():
         else:
             self.updated_at = datetime.utcnow()
 
+    def __setattr__(self, name: str, value):
+        """ Set an attribute, keeping the storage index of an indexed one
+        in step with the in-memory value
+        """
+        object.__setattr__(self, name, value)
+        if name in self.INDEXES:
+            storage.reindex(self)
+
     def __eq__(self, other: TypeVar('Base')) -> bool:
         """ Equality
         """
@@ -48,7 +78,7 @@ class Base():
         """ Convert the object a JSON dictionary
         """
         result = {}
-        for key, value in self.__dict__.items():
+        for key, value in self._attributes():
             if not for_serialization and key[0] == '_':
                 continue
             if type(value) is datetime:
@@ -57,56 +87,63 @@ class Base():
                 result[key] = value
         return result
 
+    def _attributes(self) -> Iterator[Tuple[str, object]]:
+        """ Iterate over the (name, value) of the attributes set on self
+        """
+        names = SLOT_NAMES.get(self.__class__)
+        if names is None:
+            names = [name for klass in reversed(self.__class__.__mro__)
+                     for name in klass.__dict__.get('__slots__', ())
+                     if name != '__dict__']
+            SLOT_NAMES[self.__class__] = names
+        for name in names:
+            try:
+                yield name, getattr(self, name)
+            except AttributeError:
+                continue
+        yield from getattr(self, '__dict__', {}).items()
+
     @classmethod
     def load_from_file(cls):
-        """ Load all objects from file
+        """ Load all objects from the storage
         """
-        s_class = cls.__name__
-        file_path = ".db_{}.json".format(s_class)
-        DATA[s_class] = {}
-        if not path.exists(file_path):
-            return
-
-        with open(file_path, 'r') as f:
-            objs_json = json.load(f)
-            for obj_id, obj_json in objs_json.items():
-                DATA[s_class][obj_id] = cls(**obj_json)
+        storage.load(cls)
 
     @classmethod
     def save_to_file(cls):
-        """ Save all objects to file
+        """ Save all objects to the storage
         """
-        s_class = cls.__name__
-        file_path = ".db_{}.json".format(s_class)
-        objs_json = {}
-        for obj_id, obj in DATA[s_class].items():
-            objs_json[obj_id] = obj.to_json(True)
-
-        with open(file_path, 'w') as f:
-            json.dump(objs_json, f)
+        storage.save_all(cls)
 
     def save(self):
         """ Save current object
         """
-        s_class = self.__class__.__name__
         self.updated_at = datetime.utcnow()
-        DATA[s_class][self.id] = self
-        self.__class__.save_to_file()
+        storage.save(self)
 
     def remove(self):
         """ Remove object
         """
-        s_class = self.__class__.__name__
-        if DATA[s_class].get(self.id) is not None:
-            del DATA[s_class][self.id]
-            self.__class__.save_to_file()
+        storage.remove(self)
+
+    @classmethod
+    def flush(cls):
+        """ Write every pending mutation of every class
+        """
+        storage.flush()
+
+    @classmethod
+    def bulk(cls):
+        """ Context manager grouping the writes made in it
+        """
+        return storage.bulk()
 
     @classmethod
     def count(cls) -> int:
         """ Count all objects
         """
-        s_class = cls.__name__
-        return len(DATA[s_class].keys())
+        count_lookup()
+        return storage.count(cls)
 
     @classmethod
     def all(cls) -> Iterable[TypeVar('Base')]:
@@ -118,20 +155,24 @@ class Base():
     def get(cls, id: str) -> TypeVar('Base'):
         """ Return one object by ID
         """
-        s_class = cls.__name__
-        return DATA[s_class].get(id)
+        count_lookup()
+        return storage.get(cls, id)
 
     @classmethod
     def search(cls, attributes: dict = {}) -> List[TypeVar('Base')]:
         """ Search all objects with matching attributes
         """
-        s_class = cls.__name__
-        def _search(obj):
-            if len(attributes) == 0:
-                return True
-            for k, v in attributes.items():
-                if (getattr(obj, k) != v):
-                    return False
-            return True
-        
-        return list(filter(_search, DATA[s_class].values()))
+        count_lookup()
+        return storage.search(cls, attributes)
+
+    @classmethod
+    def query(cls, filters: dict = {}, order_by: str = None,
+              limit: int = None, offset: int = 0) -> List[TypeVar('Base')]:
+        """ Page of the objects matching filters
+
+        filters maps 'attr' or 'attr__op' to a value, op being one of eq,
+        ne, lt, lte, gt, gte, in or prefix; order_by is an attribute name,
+        prefixed by '-' for descending order
+        """
+        count_lookup()
+        return storage.query(cls, filters, order_by, limit, offset)
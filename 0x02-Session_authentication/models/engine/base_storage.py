@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+""" Storage interface module
+"""
+from contextlib import contextmanager
+from datetime import datetime
+from typing import TypeVar, List, Tuple, Any
+import re
+
+
+# operator -> test of a stored value against the queried one
+QUERY_OPERATORS = {
+    'eq': lambda a, b: a == b,
+    'ne': lambda a, b: a != b,
+    'lt': lambda a, b: a < b,
+    'lte': lambda a, b: a <= b,
+    'gt': lambda a, b: a > b,
+    'gte': lambda a, b: a >= b,
+    'in': lambda a, b: a in b,
+    'prefix': lambda a, b: isinstance(a, str) and a.startswith(b),
+}
+ATTRIBUTE_NAME = re.compile(r'^[A-Za-z_][A-Za-z0-9_]*$')
+
+
+def parse_filters(filters: dict) -> List[Tuple[str, str, Any]]:
+    """ Turn {'attr__op': value} query filters into (attr, op, value)
+    conditions. A bare 'attr' means 'attr__eq'. Values are compared with
+    the JSON form of the attributes, so datetimes become strings
+    """
+    from models.base import TIMESTAMP_FORMAT
+
+    def to_json(value):
+        if isinstance(value, datetime):
+            return value.strftime(TIMESTAMP_FORMAT)
+        return value
+
+    conditions = []
+    for key, value in filters.items():
+        attr, _, op = key.partition('__')
+        op = op or 'eq'
+        if op not in QUERY_OPERATORS:
+            raise ValueError("Unknown operator {}".format(op))
+        if not ATTRIBUTE_NAME.match(attr):
+            raise ValueError("Invalid attribute {}".format(attr))
+        if op == 'in':
+            value = [to_json(v) for v in value]
+        conditions.append((attr, op, to_json(value)))
+    return conditions
+
+
+def parse_order(order_by: str) -> Tuple[str, bool]:
+    """ Turn 'attr' or '-attr' into (attr, descending)
+    """
+    attr = order_by.lstrip('-')
+    if not ATTRIBUTE_NAME.match(attr):
+        raise ValueError("Invalid attribute {}".format(attr))
+    return attr, order_by.startswith('-')
+
+
+class Storage():
+    """ Interface of the backends persisting the models
+
+    Model classes are passed in (not their names) so a backend can build
+    objects and read their INDEXES declaration
+    """
+
+    def load(self, cls: type):
+        """ (Re)load every cls object from the backing store
+        """
+        raise NotImplementedError
+
+    def save_all(self, cls: type):
+        """ Persist every cls object held in memory
+        """
+        raise NotImplementedError
+
+    def save(self, obj: TypeVar('Base')):
+        """ Insert or update obj, ValueError if it breaks a unique index
+        """
+        raise NotImplementedError
+
+    def remove(self, obj: TypeVar('Base')):
+        """ Delete obj if it is stored
+        """
+        raise NotImplementedError
+
+    def count(self, cls: type) -> int:
+        """ Number of cls objects
+        """
+        raise NotImplementedError
+
+    def get(self, cls: type, obj_id: str) -> TypeVar('Base'):
+        """ The cls object with this id, or None
+        """
+        raise NotImplementedError
+
+    def search(self, cls: type,
+               attributes: dict = {}) -> List[TypeVar('Base')]:
+        """ Every cls object whose attributes equal all of `attributes`
+        """
+        raise NotImplementedError
+
+    def reindex(self, obj: TypeVar('Base')):
+        """ Called when an indexed attribute of obj is set, saved or not:
+        in-memory backends re-index it, the others only see saved values
+        """
+
+    def query(self, cls: type, filters: dict = {}, order_by: str = None,
+              limit: int = None, offset: int = 0) -> List[TypeVar('Base')]:
+        """ Page of the cls objects matching every filter (see
+        parse_filters), sorted on order_by ('-attr' for descending)
+        """
+        raise NotImplementedError
+
+    def flush(self):
+        """ Persist every write still pending
+        """
+
+    @contextmanager
+    def bulk(self):
+        """ Group the writes made in the block
+        """
+        try:
+            yield
+        finally:
+            self.flush()
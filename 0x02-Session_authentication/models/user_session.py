@@ -11,6 +11,9 @@ import uuid
 class UserSession(Base):
     """ main class"""
 
+    __slots__ = ('user_id', 'session_id')
+    INDEXES = {'session_id': True}
+
     def __init__(self, *args: list, **kwargs: dict):
         """ initialize for user"""
         super().__init__(*args, **kwargs)
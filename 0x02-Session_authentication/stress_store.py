@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+""" Stress test of the storage: writer threads create, update and remove
+users while a bulk thread updates them in User.bulk() blocks, reader
+threads search, get and count them and a snapshot thread keeps writing
+.db_User.json
+"""
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from models.engine import storage
+from models.engine.file_storage import (
+    STORE_FLUSH_EVERY, STORE_FLUSH_INTERVAL, STORE_MODE, STORE_SHARED)
+from models.user import User
+
+
+def run(seconds: float, writers: int, readers: int) -> dict:
+    """ Hammer the storage for `seconds`, return operation and error
+    counts
+    """
+    stats = {'writes': 0, 'reads': 0, 'errors': []}
+    stop = time.monotonic() + seconds
+
+    def writer(n: int):
+        """ Create, update then remove users
+        """
+        mine = []
+        created = 0
+        while time.monotonic() < stop:
+            try:
+                created += 1
+                user = User(email="w{}-{}@hbtn.io".format(n, created))
+                user.save()
+                mine.append(user)
+                victim = random.choice(mine)
+                victim.first_name = "updated"
+                victim.save()
+                if len(mine) > 50:
+                    mine.pop(0).remove()
+                stats['writes'] += 3
+            except Exception as e:
+                stats['errors'].append(repr(e))
+
+    def bulk_writer():
+        """ Update the users of every writer in bulk blocks, as the
+        session writer thread does
+        """
+        updates = 0
+        while time.monotonic() < stop:
+            try:
+                with User.bulk():
+                    for user in User.search({'first_name': "updated"})[:5]:
+                        updates += 1
+                        user.last_name = "bulk{}".format(updates)
+                        user.save()
+                        stats['writes'] += 1
+            except Exception as e:
+                stats['errors'].append(repr(e))
+
+    def reader():
+        """ Look users up every way the API does
+        """
+        while time.monotonic() < stop:
+            try:
+                for user in User.all():
+                    User.get(user.id)
+                    User.search({'email': user.email})
+                    break
+                User.search({'first_name': "updated"})
+                User.count()
+                stats['reads'] += 4
+            except Exception as e:
+                stats['errors'].append(repr(e))
+
+    def snapshotter():
+        """ Write the whole class to file continuously
+        """
+        while time.monotonic() < stop:
+            try:
+                User.save_to_file()
+            except Exception as e:
+                stats['errors'].append(repr(e))
+
+    threads = [threading.Thread(target=writer, args=(n,))
+               for n in range(writers)]
+    threads.append(threading.Thread(target=bulk_writer))
+    threads += [threading.Thread(target=reader) for _ in range(readers)]
+    threads.append(threading.Thread(target=snapshotter))
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return stats
+
+
+def drain_order() -> bool:
+    """ Save a user from a thread whose journal write is held back, then
+    save it again in a bulk block: the latest value must win on reload.
+    Only journaled saves written as they happen can race that way
+    """
+    if STORE_MODE != 'journal' or STORE_SHARED or STORE_FLUSH_EVERY > 1 \
+            or STORE_FLUSH_INTERVAL > 0:
+        return True
+    drain = storage._journal_drain
+    queued, release = threading.Event(), threading.Event()
+
+    def held_drain(cls):
+        queued.set()
+        release.wait()
+        drain(cls)
+
+    user = User(email="order@hbtn.io")
+    user.save()
+    storage._journal_drain = held_drain
+    user.first_name = "v1"
+    thread = threading.Thread(target=user.save)
+    thread.start()
+    queued.wait()
+    storage._journal_drain = drain
+    user.first_name = "v2"
+    with User.bulk():
+        user.save()
+    release.set()
+    thread.join()
+    User.load_from_file()
+    return User.get(user.id).first_name == "v2"
+
+
+if __name__ == "__main__":
+    seconds = float(sys.argv[1]) if len(sys.argv) > 1 else 5
+    with tempfile.TemporaryDirectory() as tmp:
+        os.chdir(tmp)
+        User.load_from_file()
+        stats = run(seconds, writers=8, readers=32)
+        User.flush()
+        in_memory = {user.id: user.to_json(True) for user in User.all()}
+        User.load_from_file()
+        on_disk = {user.id: user.to_json(True) for user in User.all()}
+        ordered = drain_order()
+    print("{} writes, {} reads, {} errors".format(
+        stats['writes'], stats['reads'], len(stats['errors'])))
+    for error in sorted(set(stats['errors']))[:10]:
+        print("  {}".format(error))
+    print("store consistent with disk: {}".format(in_memory == on_disk))
+    print("delayed write kept in order: {}".format(ordered))
+    sys.exit(1 if stats['errors'] or in_memory != on_disk or not ordered
+             else 0)
@@ -6,7 +6,7 @@ Main file
 from db import DB
 from user import User
 
-my_db = DB()
+my_db = DB(reset=True)
 
 user_1 = my_db.add_user("test@test.com", "SuperHashedPwd")
 print(user_1.id)
@@ -9,7 +9,7 @@ from sqlalchemy.exc import InvalidRequestError
 from sqlalchemy.orm.exc import NoResultFound
 
 
-my_db = DB()
+my_db = DB(reset=True)
 
 email = test@test.com
 hashed_password = "hashedPwd"
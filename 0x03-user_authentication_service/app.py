@@ -5,6 +5,7 @@
 
 from flask import Flask, jsonify, request, abort, redirect
 from auth import Auth
+from hash_service import HashServiceBusy
 
 # Instantiate the Auth object
 AUTH = Auth()
@@ -13,6 +14,23 @@ AUTH = Auth()
 app = Flask(__name__)
 
 
+@app.teardown_appcontext
+def close_db_session(exception) -> None:
+    """Give the request's database session back to the pool.
+    """
+    AUTH._db.close_session()
+
+
+@app.errorhandler(HashServiceBusy)
+def hash_service_busy(error) -> str:
+    """Password hashing is saturated: ask the client to retry
+    instead of queueing more bcrypt work.
+    """
+    response = jsonify({"message": "Service busy, retry later"})
+    response.headers['Retry-After'] = '1'
+    return response, 503
+
+
 @app.route('/', methods=['GET'], strict_slashes=False)
 def welcome() -> str:
     """GET /
@@ -147,6 +165,8 @@ def update_password() -> str:
 
     try:
         AUTH.update_password(reset_token, new_password)
+    except HashServiceBusy:
+        raise
     except Exception:
         abort(403)
 
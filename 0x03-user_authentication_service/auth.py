@@ -2,7 +2,6 @@
 
 """ Authentication module for user management """
 
-import bcrypt
 import uuid
 from sqlalchemy import create_engine
 from sqlalchemy.ext.declarative import declarative_base
@@ -10,12 +9,13 @@ from sqlalchemy.orm import sessionmaker
 from sqlalchemy.orm.exc import NoResultFound
 from sqlalchemy.exc import InvalidRequestError
 from db import DB
+from hash_service import hash_service
 from user import User
 
 
 def _hash_password(password: str) -> str:
-    """ Generate a salted hash of the password """
-    return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt())
+    """ Generate a salted hash of the password in the hashing pool """
+    return hash_service().hash(password)
 
 
 def _generate_uuid() -> str:
@@ -44,7 +44,7 @@ class Auth:
         """ Validate user login """
         try:
             user = self._db.find_user_by(email=email)
-            if bcrypt.checkpw(password.encode('utf-8'), user.hashed_password):
+            if hash_service().check(password, user.hashed_password):
                 return True
         except NoResultFound:
             pass
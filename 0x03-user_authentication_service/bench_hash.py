@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+
+""" Benchmark of the hashing service: a burst of concurrent logins at
+several bcrypt cost factors, reporting throughput, latency and rejections
+
+Usage: ./bench_hash.py [clients] [logins per client]
+"""
+
+import sys
+import threading
+import time
+
+from hash_service import HashService, HashServiceBusy
+
+
+def bench(rounds: int, clients: int, logins: int) -> dict:
+    """ Run clients threads each checking logins passwords """
+    service = HashService(rounds=rounds)
+    hashed = service.hash("MyAmazingPassw0rd")
+    latencies, rejected = [], [0]
+    lock = threading.Lock()
+
+    def client():
+        for _ in range(logins):
+            start = time.perf_counter()
+            try:
+                service.check("MyAmazingPassw0rd", hashed)
+            except HashServiceBusy:
+                with lock:
+                    rejected[0] += 1
+                continue
+            with lock:
+                latencies.append(time.perf_counter() - start)
+
+    threads = [threading.Thread(target=client) for _ in range(clients)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    service.shutdown()
+
+    latencies.sort()
+    return {
+        'rounds': rounds,
+        'per_sec': len(latencies) / elapsed,
+        'p50': latencies[len(latencies) // 2] * 1000 if latencies else 0,
+        'p99': latencies[int(len(latencies) * .99)] * 1000
+        if latencies else 0,
+        'rejected': rejected[0],
+    }
+
+
+if __name__ == "__main__":
+    clients = int(sys.argv[1]) if len(sys.argv) > 1 else 64
+    logins = int(sys.argv[2]) if len(sys.argv) > 2 else 4
+    print("{} clients x {} logins".format(clients, logins))
+    for rounds in (10, 11, 12, 13):
+        print("rounds={rounds:<3} {per_sec:8.1f} logins/s  "
+              "p50 {p50:8.1f} ms  p99 {p99:8.1f} ms  "
+              "{rejected} rejected".format(**bench(rounds, clients, logins)))
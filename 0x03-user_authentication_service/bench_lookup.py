@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+
+""" Benchmark of find_user_by style lookups on email, session_id and
+reset_token, with the schema indexes and without them
+
+Usage: ./bench_lookup.py [users, 1000000 by default]
+"""
+
+import os
+import random
+import sys
+import tempfile
+import time
+import uuid
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import sessionmaker
+
+from db import create_schema
+from user import User
+
+COLUMNS = ('email', 'session_id', 'reset_token')
+
+
+def populate(engine, users: int) -> list:
+    """ Insert users in batches, return the rows """
+    rows = [{'email': "user{}@holberton.io".format(i),
+             'hashed_password': "x",
+             'session_id': str(uuid.uuid4()),
+             'reset_token': str(uuid.uuid4())} for i in range(users)]
+    with engine.begin() as conn:
+        for start in range(0, users, 50000):
+            conn.execute(User.__table__.insert(), rows[start:start + 50000])
+    return rows
+
+
+def bench(session, rows: list, lookups: int) -> dict:
+    """ Mean lookup latency in ms per column """
+    latencies = {}
+    for column in COLUMNS:
+        values = [row[column] for row in random.sample(rows, lookups)]
+        start = time.perf_counter()
+        for value in values:
+            session.query(User).filter_by(**{column: value}).first()
+        latencies[column] = (time.perf_counter() - start) / lookups * 1000
+    return latencies
+
+
+if __name__ == "__main__":
+    users = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_engine("sqlite:///" + os.path.join(tmp, "bench.db"))
+        create_schema(engine)
+        rows = populate(engine, users)
+        session = sessionmaker(bind=engine)()
+
+        results = {'indexed': bench(session, rows, 1000)}
+        session.close()
+        with engine.begin() as conn:
+            for index in User.__table__.indexes:
+                conn.execute(text('DROP INDEX "{}"'.format(index.name)))
+        session = sessionmaker(bind=engine)()
+        results['table scan'] = bench(session, rows, 20)
+        session.close()
+        engine.dispose()
+
+    print("{} users".format(users))
+    for name, latencies in results.items():
+        print("{:<10} ".format(name) + "  ".join(
+            "{} {:8.3f} ms".format(column, latencies[column])
+            for column in COLUMNS))
@@ -3,38 +3,137 @@
 """ Database class to save and update databse
 """
 
-from sqlalchemy import create_engine
+import os
+
+from sqlalchemy import create_engine, event, func, inspect
+from sqlalchemy.engine import make_url
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import Session, scoped_session, sessionmaker
+from sqlalchemy.pool import QueuePool, StaticPool
 from sqlalchemy.orm.exc import NoResultFound
-from sqlalchemy.exc import InvalidRequestError
+from sqlalchemy.exc import IntegrityError, InvalidRequestError
 from user import Base, User
 
 
+DB_URL = os.getenv('DB_URL', 'sqlite:///a.db')
+DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', '5'))
+DB_MAX_OVERFLOW = int(os.getenv('DB_MAX_OVERFLOW', '10'))
+DB_POOL_RECYCLE = int(os.getenv('DB_POOL_RECYCLE', '1800'))
+
+
+def duplicates(engine, column) -> list:
+    """ Non-NULL values of column held by more than one row """
+    session = Session(bind=engine)
+    try:
+        return [value for value, in session.query(column)
+                .filter(column.isnot(None)).group_by(column)
+                .having(func.count() > 1)]
+    finally:
+        session.close()
+
+
+def create_schema(engine) -> None:
+    """ Create the missing tables and indexes, keeping existing data:
+    create_all() skips tables that exist, so their new indexes are
+    created one by one. Raise a ValueError naming the duplicated values
+    before any unique index they would break is created
+    """
+    Base.metadata.create_all(engine)
+    inspector = inspect(engine)
+    missing = []
+    for table in Base.metadata.sorted_tables:
+        existing = {index['name'] for index in
+                    inspector.get_indexes(table.name)}
+        missing += [index for index in table.indexes
+                    if index.name not in existing]
+    errors = []
+    for index in missing:
+        if index.unique:
+            for column in index.columns:
+                values = duplicates(engine, column)
+                if values:
+                    errors.append("{} has duplicate values: {}".format(
+                        column, ", ".join(map(str, values))))
+    if errors:
+        raise ValueError("; ".join(errors))
+    for index in missing:
+        index.create(bind=engine)
+
+
+def _sqlite_pragmas(dbapi_connection, connection_record) -> None:
+    """ WAL lets readers run alongside the writer, NORMAL syncs at
+    checkpoints only, and writers wait for the lock instead of failing
+    """
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.execute("PRAGMA busy_timeout=5000")
+    cursor.close()
+
+
+def make_engine(url: str):
+    """ Engine of url with a pool sized by DB_POOL_SIZE/DB_MAX_OVERFLOW,
+    plus the SQLite pragmas for a database file. An in-memory SQLite
+    database is a single connection shared by every thread
+    """
+    url = make_url(url)
+    options = {'echo': False, 'pool_pre_ping': True}
+    if url.get_backend_name() == 'sqlite':
+        if url.database in (None, '', ':memory:'):
+            # each connection would be a new empty database: the session
+            # of every thread shares the one connection instead
+            return create_engine(
+                url, connect_args={'check_same_thread': False},
+                poolclass=StaticPool, **options)
+        # pooled connections move between the request threads
+        options['connect_args'] = {'check_same_thread': False}
+        options['poolclass'] = QueuePool
+    else:
+        options['pool_recycle'] = DB_POOL_RECYCLE
+    engine = create_engine(url, pool_size=DB_POOL_SIZE,
+                           max_overflow=DB_MAX_OVERFLOW, **options)
+    if url.get_backend_name() == 'sqlite':
+        event.listen(engine, 'connect', _sqlite_pragmas)
+    return engine
+
+
 class DB:
     """ main data base class """
 
-    def __init__(self):
-        """ Init function """
-        self._engine = create_engine("sqlite:///a.db", echo=False)
-        Base.metadata.drop_all(self._engine)
-        Base.metadata.create_all(self._engine)
-        self.__session = None
+    def __init__(self, url: str = None, reset: bool = False):
+        """ Init function: open url (DB_URL by default) keeping its data
+        unless reset
+        """
+        self._engine = make_engine(url or DB_URL)
+        if reset:
+            Base.metadata.drop_all(self._engine)
+        create_schema(self._engine)
+        # one session per thread; objects stay readable after commit
+        self.__session = scoped_session(
+            sessionmaker(bind=self._engine, expire_on_commit=False))
 
     @property
     def _session(self):
-        """ returns a session
+        """ returns the session of the current thread
+        """
+        return self.__session()
+
+    def close_session(self) -> None:
+        """ Close the session of the current thread, giving its
+        connection back to the pool
         """
-        if self.__session is None:
-            DBSession = sessionmaker(bind=self._engine)
-            self.__session = DBSession()
-        return self.__session
+        self.__session.remove()
 
     def add_user(self, email: str, hashed_password: str) -> User:
-        """ adding database """
+        """ adding database: ValueError if email is already taken, as
+        when a concurrent registration commits first
+        """
         user = User(email=email, hashed_password=hashed_password)
         self._session.add(user)
-        self._session.commit()
+        try:
+            self._commit()
+        except IntegrityError:
+            raise ValueError("User {} already exists.".format(email))
         return user
 
     def find_user_by(self, **kwargs) -> User:
@@ -70,4 +169,14 @@ class DB:
                 setattr(user_to_update, key, value)
             else:
                 raise ValueError
-        self._session.commit()
+        self._commit()
+
+    def _commit(self) -> None:
+        """ Commit the thread's session, rolling it back on failure so
+        it stays usable for the next request
+        """
+        try:
+            self._session.commit()
+        except Exception:
+            self._session.rollback()
+            raise
@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+
+""" Password hashing service: bcrypt runs in a sized pool of threads
+(bcrypt releases the GIL) behind a bounded queue, so a login burst
+gets fast rejections instead of piling up on the request threads
+"""
+
+import os
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable
+
+import bcrypt
+
+BCRYPT_ROUNDS = int(os.getenv('BCRYPT_ROUNDS', '12'))
+HASH_WORKERS = int(os.getenv('HASH_WORKERS', str(os.cpu_count() or 1)))
+# jobs allowed to wait for a worker before new ones are rejected
+HASH_QUEUE_SIZE = int(os.getenv('HASH_QUEUE_SIZE', '32'))
+
+
+class HashServiceBusy(Exception):
+    """ Raised when the pool and its queue are full """
+
+
+class HashService:
+    """ Pool running the bcrypt computations """
+
+    def __init__(self, workers: int = HASH_WORKERS,
+                 queue_size: int = HASH_QUEUE_SIZE,
+                 rounds: int = BCRYPT_ROUNDS):
+        """ Start a pool of workers accepting queue_size waiting jobs """
+        self.rounds = rounds
+        self._pool = ThreadPoolExecutor(workers,
+                                        thread_name_prefix='hash')
+        self._slots = threading.BoundedSemaphore(workers + queue_size)
+        self.rejected = 0
+
+    def submit(self, func: Callable, *args) -> Future:
+        """ Run func in the pool, HashServiceBusy if it is saturated """
+        if not self._slots.acquire(blocking=False):
+            self.rejected += 1
+            raise HashServiceBusy
+        try:
+            future = self._pool.submit(func, *args)
+        except BaseException:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        return future
+
+    def hash(self, password: str) -> bytes:
+        """ Salted bcrypt hash of password """
+        salt = bcrypt.gensalt(self.rounds)
+        return self.submit(bcrypt.hashpw, password.encode('utf-8'),
+                           salt).result()
+
+    def check(self, password: str, hashed_password: bytes) -> bool:
+        """ Whether password matches hashed_password """
+        return self.submit(bcrypt.checkpw, password.encode('utf-8'),
+                           hashed_password).result()
+
+    def shutdown(self) -> None:
+        """ Finish the running jobs and stop the workers """
+        self._pool.shutdown()
+
+
+_service = None
+_service_lock = threading.Lock()
+
+
+def hash_service() -> HashService:
+    """ The shared service, started on first use """
+    global _service
+    if _service is None:
+        with _service_lock:
+            if _service is None:
+                _service = HashService()
+    return _service
@@ -10,7 +10,7 @@ print(User.__tablename__)
 for column in User.__table__.columns:
     print("{}: {}".format(column, column.type))
 
-my_db = DB()
+my_db = DB(reset=True)
 
 user_1 = my_db.add_user("test@test.com", "SuperHashedPwd")
 print(user_1.id)
@@ -0,0 +1,20 @@
+#!/usr/bin/env python3
+
+""" Upgrade an existing database to the current schema in place
+
+Usage: ./migrate.py [database URL, DB_URL by default]
+"""
+
+import sys
+
+from db import DB_URL, create_schema, make_engine
+
+
+if __name__ == "__main__":
+    url = sys.argv[1] if len(sys.argv) > 1 else DB_URL
+    try:
+        create_schema(make_engine(url))
+    except ValueError as err:
+        sys.exit("{} not migrated, fix these rows first: {}"
+                 .format(url, err))
+    print("{} is up to date".format(url))